@@ -0,0 +1,47 @@
+"""
+Benchmark of the conversion of float32 data read from the database to float64, as done in BaseDownloader.load:
+the previous astype(str).astype(np.float64) against widen_float32_columns.
+Data is a synthetic DataFrame with the shape of a market with a long history: prices with 2 decimals and
+maturities as timestamps, with missing values.
+Usage:
+    python benchmarks/bench_float_widening.py [rows] [columns]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.numeric import widen_float32_columns
+
+
+def synthetic_data(rows: int, columns: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    prices = np.round(rng.uniform(5, 300, (rows, columns // 2)), 2)
+    maturities = rng.integers(1.1e9, 2e9, (rows, columns - columns // 2)).astype(np.float64)
+    values = np.hstack([prices, maturities]).astype(np.float32)
+    values[rng.random(values.shape) < 0.5] = np.nan
+    return pd.DataFrame(values, index=pd.bdate_range("2006-01-02", periods=rows, tz="Europe/Madrid"))
+
+
+def measure(name: str, function, df: pd.DataFrame) -> pd.DataFrame:
+    tracemalloc.start()
+    start = time.perf_counter()
+    retval = function(df)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<25} {elapsed:8.3f} s {peak / 2 ** 20:10.1f} MiB peak")
+    return retval
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 4_700
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    data = synthetic_data(rows, columns)
+    print(f"Converting {rows} x {columns} float32 values ({data.memory_usage().sum() / 2 ** 20:.1f} MiB)")
+    before = measure("astype(str) (before)", lambda df: df.astype(str).astype(np.float64), data)
+    after = measure("widen_float32 (after)", widen_float32_columns, data)
+    pd.testing.assert_frame_equal(before, after)
+    print("Results are identical")
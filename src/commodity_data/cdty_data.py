@@ -1,10 +1,28 @@
+import time
+from dataclasses import dataclass
+
 import pandas as pd
 
 from commodity_data.downloaders import (EEXDownloader, OmipDownloader, BarchartDownloader, EsiosDownloader)
 from commodity_data.downloaders.base_downloader import BaseDownloader, FilterKeyNotFoundException
+from commodity_data.downloaders.workers import worker_pools_stats, shutdown_worker_pools, WorkerPool
 from commodity_data.globals import logger
 
 
+@dataclass
+class DownloadSummary:
+    """Result of downloading data of a market"""
+    market: str
+    downloaded_days: int = 0  # Number of as_of dates downloaded
+    elapsed: float = 0  # Seconds spent downloading
+    last_data_ts: pd.Timestamp | None = None  # Date of last data available after downloading
+    error: Exception | None = None  # Exception raised while downloading, if any
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
 class CommodityData:
     """
     Class to download data to and query data from a OngTSDB database
@@ -58,18 +76,71 @@ class CommodityData:
         for market, downloader in self.downloaders(markets=markets):
             downloader.delete_all_data(not ask_confirmation)
 
-    def download_all_yesterday(self):
-        """Updates all downloaders until yesterday"""
+    def download_all_yesterday(self, concurrent: bool = False, raise_errors: bool = True) -> dict:
+        """Updates all downloaders until yesterday. See download for the meaning of the parameters"""
         yesterday = pd.Timestamp.today().normalize() - pd.offsets.BDay(1)
-        for mkt, downloader in self.downloaders():
-            downloader.download(end_date=yesterday)
+        return self.download(end_date=yesterday, concurrent=concurrent, raise_errors=raise_errors)
 
     def download(self, start_date: pd.Timestamp = None, end_date: pd.Timestamp = None,
                  force_download: bool | list | dict = False,
-                 markets: str | list = None):
-        """Same as BaseDownloader.downloaders, but working with all downloaders"""
-        for markets, downloader in self.downloaders(markets):
-            downloader.download(start_date, end_date, force_download=force_download)
+                 markets: str | list = None, concurrent: bool = False, raise_errors: bool = True,
+                 fill_gaps: bool = False) -> dict:
+        """
+        Same as BaseDownloader.download, but working with all downloaders
+        :param start_date: see BaseDownloader.download
+        :param end_date: see BaseDownloader.download
+        :param force_download: see BaseDownloader.download
+        :param markets: optional filter of markets to download
+        :param concurrent: if True, all markets are downloaded at the same time. As each market is read from a
+        different host, each one keeps its own concurrency budget (max_concurrent_requests). Defaults to False
+        (download markets one after another)
+        :param raise_errors: if True (default), once all markets are finished raises the first error found, if any
+        :param fill_gaps: see BaseDownloader.download
+        :return: a dict with market as keys and a DownloadSummary as values
+        """
+        downloaders = dict(self.downloaders(markets))
+
+        def download_market(market: str) -> DownloadSummary:
+            summary = DownloadSummary(market)
+            downloader = downloaders[market]
+            start = time.monotonic()
+            try:
+                summary.downloaded_days = downloader.download(start_date, end_date, force_download=force_download,
+                                                              fill_gaps=fill_gaps)
+                summary.last_data_ts = downloader.last_data_ts
+            except Exception as e:
+                self.logger.error(f"Could not download {market} data: {e}")
+                summary.error = e
+            summary.elapsed = time.monotonic() - start
+            self.logger.info(f"Finished downloading {market}: {summary}")
+            return summary
+
+        if concurrent and len(downloaders) > 1:
+            # A pool per call, sized for the markets of this call (shared pools keep their first size)
+            pool = WorkerPool(self.__class__.__name__, len(downloaders))
+            try:
+                summaries = pool.map(download_market, downloaders)
+            finally:
+                pool.shutdown()
+        else:
+            summaries = list(map(download_market, downloaders))
+        self.logger.info(f"Worker pools usage: {self.worker_stats()}")
+        retval = {summary.market: summary for summary in summaries}
+        if raise_errors:
+            for summary in summaries:
+                if not summary.ok:
+                    raise summary.error
+        return retval
+
+    @staticmethod
+    def worker_stats() -> dict:
+        """Returns the usage of the worker pools shared by all downloaders, with market as key"""
+        return worker_pools_stats()
+
+    @staticmethod
+    def shutdown():
+        """Stops the worker pools shared by all downloaders. They will be recreated if needed"""
+        shutdown_worker_pools()
 
     def settle_xs(self, allow_zero_prices: bool = True, markets=None, commodity=None, instrument=None, area=None,
                   product=None, offset=None, type=None, maturity=None) -> pd.DataFrame:
@@ -104,10 +175,25 @@ class CommodityData:
             retval = pd.DataFrame()
         return retval
 
-    def load(self, markets=None):
-        """Loads data from database to memory for the given markets (all by default)"""
+    def load(self, markets=None, since: pd.Timestamp | str = None):
+        """Loads data from database to memory for the given markets (all by default). See BaseDownloader.load"""
         for mkt, downloader in self.downloaders(markets=markets):
-            downloader.load()
+            downloader.load(since=since)
+
+    def refresh(self, markets=None) -> dict:
+        """Reads just the new data of the given markets (all by default). Returns a dict with market as key and
+        the number of new rows as value"""
+        return {mkt: downloader.refresh() for mkt, downloader in self.downloaders(markets=markets)}
+
+    def publish(self, markets=None):
+        """Publishes the data of the given markets (all by default) for other processes. See BaseDownloader.publish"""
+        for mkt, downloader in self.downloaders(markets=markets):
+            downloader.publish()
+
+    def attach(self, markets=None) -> dict:
+        """Attaches to the data published by another process for the given markets (all by default). Returns a dict
+        with market as key and True if it was attached as value. See BaseDownloader.attach"""
+        return {mkt: downloader.attach() for mkt, downloader in self.downloaders(markets=markets)}
 
     def get_last_ts(self, markets: str | list = None) -> dict:
         """Returns a dict, with market name as key and the last date of its data as value"""
@@ -14,6 +14,7 @@ from commodity_data.globals import logger
 
 
 class BarchartData(_HttpGet):
+    http_limits_name = "Barchart"
     token_cookie = "XSRF-TOKEN"
 
     def __init__(self):
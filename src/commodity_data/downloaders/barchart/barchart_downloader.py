@@ -29,46 +29,62 @@ class BarchartDownloader(BaseDownloader):
         return pd.Timestamp(2013, 1, 1, tz=self.local_tz)
 
     def _prepare_cache(self, start_date: pd.Timestamp, end_date: pd.Timestamp, force_download: bool):
-        cache = dict()
+        configs = list()
         for cfg in self._iter_download_config():
-            symbol = cfg.download_cfg.symbol
             expiry = self.as_local_date(cfg.download_cfg.expiry)
             # If product is expired for the cache dates, there is no need to download it again
             if expiry and (expiry < start_date):
                 continue
-            df_barchart = self.data.download(symbol, start_date=start_date, end_date=end_date)
-            df_barchart.as_of = pd.to_datetime(df_barchart.as_of).dt.tz_localize(self.local_tz)
-            df_barchart = df_barchart[df_barchart.as_of >= start_date]
-            df = df_barchart.loc[:, ("open", "high", "low", TypeColumn.close.value, "as_of")]  # Store OHLC
-            # pivot df so OHLC are split by row
-            df_melt = df.melt(id_vars="as_of", var_name="type", value_name="price")
-            df_melt['market'] = self.name()
-            for column_name, column_value in cfg.commodity_cfg.__dict__.items():
-                df_melt[column_name] = column_value
-            product = cfg.download_cfg.product
-            df_melt['product'] = product
-            # df['type'] = TypeColumn.close.value
-            expiry = cfg.download_cfg.expiry
-            if expiry is not None:
-                maturity = pd.to_datetime(expiry)
-                df_melt['maturity'] = maturity.timestamp()
-                df_melt['offset'] = pd_date_offset(df_melt.as_of.dt, maturity=maturity, product=product)
-            else:
-                df_melt['maturity'] = df_melt.as_of.apply(lambda dt: dt.timestamp())
-                df_melt['offset'] = 0  # If no maturity, then it is supposed to be a stock or a spot value
-            # Reduce a little bit the amount of data by limiting offsets to 12 months or 4 years
-            max_offset = 12 
-            if cfg.download_cfg.product == "M":
-                max_offset = 12
-            elif cfg.download_cfg.product == "Y":
-                max_offset = 4    
-            cache[symbol] = df_melt[df_melt['offset'] < max_offset]
+            configs.append(cfg)
+        if configs:
+            # Get cookies before downloading symbols in parallel, so they are not requested by every worker
+            self.data.init_connection(configs[0].download_cfg.symbol)
+        dfs = self.workers.map(lambda cfg: self._download_symbol(cfg, start_date, end_date), configs)
+        cache = {cfg.download_cfg.symbol: df for cfg, df in zip(configs, dfs)}
 
         concat_df = pd.concat(cache.values(), axis=0)
         concat_df.rename(columns={"price": "close"}, inplace=True)
         cache_df = self._pivot_table(concat_df, value_columns=['close', 'maturity'])
         self.cache = cache_df
 
+    def _config_series_filter(self, cfg) -> dict:
+        retval = super()._config_series_filter(cfg)
+        if cfg.download_cfg.expiry is not None:
+            # Contracts of the same commodity and product share series, they are told apart by their maturity
+            retval['maturity'] = cfg.download_cfg.expiry
+        return retval
+
+    def _download_symbol(self, cfg: BarchartConfig, start_date: pd.Timestamp, end_date: pd.Timestamp) -> DataFrame:
+        """Downloads the data of a config symbol, returning a melted dataframe to be pivoted"""
+        symbol = cfg.download_cfg.symbol
+        df_barchart = self.data.download(symbol, start_date=start_date, end_date=end_date)
+        df_barchart.as_of = pd.to_datetime(df_barchart.as_of).dt.tz_localize(self.local_tz)
+        df_barchart = df_barchart[df_barchart.as_of >= start_date]
+        df = df_barchart.loc[:, ("open", "high", "low", TypeColumn.close.value, "as_of")]  # Store OHLC
+        # pivot df so OHLC are split by row
+        df_melt = df.melt(id_vars="as_of", var_name="type", value_name="price")
+        df_melt['market'] = self.name()
+        for column_name, column_value in cfg.commodity_cfg.__dict__.items():
+            df_melt[column_name] = column_value
+        product = cfg.download_cfg.product
+        df_melt['product'] = product
+        # df['type'] = TypeColumn.close.value
+        expiry = cfg.download_cfg.expiry
+        if expiry is not None:
+            maturity = pd.to_datetime(expiry)
+            df_melt['maturity'] = self.maturity_values([maturity])[0]
+            df_melt['offset'] = pd_date_offset(df_melt.as_of.dt, maturity=maturity, product=product)
+        else:
+            df_melt['maturity'] = self.maturity_values(df_melt.as_of)
+            df_melt['offset'] = 0  # If no maturity, then it is supposed to be a stock or a spot value
+        # Reduce a little bit the amount of data by limiting offsets to 12 months or 4 years
+        max_offset = 12
+        if cfg.download_cfg.product == "M":
+            max_offset = 12
+        elif cfg.download_cfg.product == "Y":
+            max_offset = 4
+        return df_melt[df_melt['offset'] < max_offset]
+
     def _download_date(self, as_of: pd.Timestamp) -> Union[DataFrame, Series, None]:
         if as_of in self.cache.index:
             df = self.cache.loc[[as_of]]
@@ -1,24 +1,43 @@
 import abc
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import functools
 import holidays
 import logging
 import marshmallow_dataclass
-import multiprocessing.pool
 import numpy as np
 import pandas as pd
 import pandas.core.dtypes.dtypes
-import pyotp
 import time
+import urllib3
 from ong_utils import is_debugging, cookies2header, OngTimer
 
-import ong_tsdb.exceptions
+from commodity_data.downloaders.catalog import SeriesCatalog
+from commodity_data.downloaders.chunking import AdaptiveChunker
 from commodity_data.downloaders.continuous_prices import calculate_continuous_prices
+from commodity_data.downloaders.coverage import CoverageIndex
 from commodity_data.downloaders.default_config import default_config
+from commodity_data.downloaders.empty_results import EmptyResultsCache
+from commodity_data.downloaders.http_cache import get_http_cache
+from commodity_data.downloaders.http_limits import HttpLimits, get_token_bucket, parse_retry_after, retry_status
+from commodity_data.downloaders.journal import DownloadJournal
+from commodity_data.downloaders.numeric import widen_float32_columns
+from commodity_data.downloaders.products import valid_product
 from commodity_data.downloaders.series_config import df_index_columns, TypeColumn
-from commodity_data.globals import config, logger, http, get_password
-from ong_tsdb.client import OngTsdbClient
+from commodity_data.downloaders.shared_matrix import SharedSettlementMatrix
+from commodity_data.downloaders.snapshot import SettlementSnapshot
+from commodity_data.downloaders.storage import get_storage_backend, StorageBackend
+from commodity_data.downloaders.workers import get_worker_pool, WorkerPool
+from commodity_data.downloaders.write_buffer import WriteBuffer
+from commodity_data.globals import config, logger, http
 
 pd.options.mode.chained_assignment = 'raise'  # Raises SettingWithCopyWarning error instead of just warning
 
+# Ids of the configs to be downloaded for the as_of date being downloaded in the current task (None for all)
+_as_of_config_ids = contextvars.ContextVar("as_of_config_ids", default=None)
+
 
 def _update_dataframe(old_df: pd.DataFrame, new_data: pd.DataFrame) -> pd.DataFrame:
     """Updates an old_df adding columns and rows of the new data dataframe"""
@@ -36,6 +55,37 @@ def _update_dataframe(old_df: pd.DataFrame, new_data: pd.DataFrame) -> pd.DataFr
         return new_data
 
 
+def _delta_dataframe(old_df: pd.DataFrame | None, new_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the rows and columns of new_df that have any value different from old_df (including new rows and
+    columns), so just the changes are written to the database. Missing values are equal to each other, and floats
+    are compared as float32, as they are stored in the database
+    """
+    if old_df is None or old_df.empty or new_df.empty:
+        return new_df
+    index = new_df.index
+    if index.tz != old_df.index.tz:
+        index = index.tz_localize(old_df.index.tz) if not index.tz else index.tz_convert(old_df.index.tz)
+    old = old_df.reindex(index=index, columns=new_df.columns).set_axis(new_df.index)
+    float_columns = {col: np.float32 for col, dtype in new_df.dtypes.items() if pd.api.types.is_float_dtype(dtype)}
+    new = new_df.astype(float_columns)
+    old = old.astype({col: dtype for col, dtype in float_columns.items()
+                      if pd.api.types.is_float_dtype(old.dtypes[col])})
+    changed = new.ne(old) & ~(new.isna() & old.isna())
+    return new_df.loc[changed.any(axis=1), changed.any(axis=0)]
+
+
+def _run_coroutine(coro):
+    """Runs a coroutine till completion and returns its result. If there is already an event loop running
+    in this thread (e.g. in a jupyter notebook) the coroutine is run in a new loop in a separate thread"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
 class StoreDataException(Exception):
     """Exception raised when dump failed"""
     pass
@@ -46,22 +96,6 @@ class FilterKeyNotFoundException(Exception):
     pass
 
 
-class _GoogleAuth(pyotp.TOTP):
-    last_otp = ""
-
-    def now(self) -> str:
-        """Returns a TOTP code, preventing reuse (waits for a new one if needed)"""
-        otp = super().now()
-        if otp == _GoogleAuth.last_otp:
-            logger.info("Waiting for new MFA code...")
-            while super().now() == _GoogleAuth.last_otp:
-                time.sleep(1)
-            logger.info("New MFA code generated")
-        otp = super().now()
-        _GoogleAuth.last_otp = otp
-        return otp
-
-
 def _combine_config(default_config: list, config: list, parser, use_default: bool = True) -> list:
     """
     Returns a list of parsed values from a combination of default_config and config, depending on parameters
@@ -91,78 +125,67 @@ def _combine_config(default_config: list, config: list, parser, use_default: boo
 
 class _HttpGet:
     """Class that adds http_get functionality for downloading and connecting"""
+    http_limits_name = None  # Key of the "http_limits" config for this class. Defaults to the class name
+    # Retries are done by http_get, so the ones of the pool manager are disabled (redirects are still followed)
+    http_retries = urllib3.util.Retry(connect=0, read=0, status=0, other=0, respect_retry_after_header=False)
 
     def __init__(self):
         self.http = http
         self.headers = None
         self.cookies = None
+        self.__http_limits = None
+
+    @property
+    def http_limits(self) -> HttpLimits:
+        """Rate limits and retries for the requests of this class, read from config the first time"""
+        if self.__http_limits is None:
+            self.__http_limits = HttpLimits.from_config(self.http_limits_name or self.__class__.__name__)
+        return self.__http_limits
 
     def http_get(self, url: str, params=None):
         """
-        Performs a http get. Tries to perform it with validation and retries without validation on case of error
+        Performs a http get. Requests are rate limited per host and retried with exponential backoff (honoring
+        Retry-After header) in case of throttling, server or connection errors, as configured in self.http_limits.
+        Responses can be recorded and replayed from an on-disk cache (see commodity_data.downloaders.http_cache). In
+        replay mode, requests not found in the cache raise HttpCacheMissError instead of connecting
         :param url: the url to get
         :param params: (optional) the parameters of the url
         :return: a requests object
         """
+        http_cache = get_http_cache()
+        if (cached := http_cache.get(url, params)) is not None:
+            return cached
         headers = self.headers or dict()
         if self.cookies:
             cookies = cookies2header(cookies=self.cookies)
             headers.update(cookies)
-        req = self.http.request("get", url, headers=headers, fields=params)
-        if req.status >= 399:
-            raise ConnectionError(f"Could not connect to {url}. Received status {req.status}: {req.reason}")
-        return req
-
-
-class _OngTsdbClientManager:
-    __client = None
-    __otp = None
-    __write_token = config("write_token")
-    __admin_token = config("admin_token")
-    __server_url = config("url")
-    logger = logger
-
-    def __init__(self, name: str, ):
-        self.name = name
-
-    @classmethod
-    def proxy_auth_dict(cls, name: str) -> dict | None:
-        """Returns proxy auth dict, including MFA Code"""
-        if config("service_name_google_auth", None) is not None and cls.__otp is None:
-            cls.__otp = _GoogleAuth(get_password("service_name_google_auth", "proxy_username"))
-        if cls.__otp is None:
-            return None
-        cls.logger.info(f"Getting MFA code for {name}")
-        mfa_code = cls.__otp.now()
-        proxy_auth_dict = dict(username=config("proxy_username"),
-                               password=get_password("service_name_proxy", "proxy_username"),
-                               mfa_code=mfa_code)
-        return proxy_auth_dict
-
-    @classmethod
-    def __create_admin_client(cls, name: str):
-        if cls.__client is None:
-            cls.__client = OngTsdbClient(cls.__server_url, cls.__admin_token, retry_connect=1,
-                                         retry_total=1, proxy_auth_body=cls.proxy_auth_dict(name),
-                                         validate_server_version=config("validate_server_version", True))
-
-    @property
-    def admin_client(self) -> OngTsdbClient:
-        if self.__client is None:
+        limits = self.http_limits
+        bucket = get_token_bucket(urllib3.util.parse_url(url).host, limits)
+        for attempt in range(limits.max_retries + 1):
+            bucket.acquire()
+            retry_after = None
             try:
-                self.__create_admin_client(self.name)
-            except ong_tsdb.exceptions.ProxyNotAuthorizedException:
-                self.logger.info("Could not get proxy authorization, retrying")
-                # Try again
-                self.__create_admin_client(self.name)
-        self.__client.update_token(self.__admin_token)
-        return self.__client
-
-    @property
-    def write_client(self) -> OngTsdbClient:
-        client = self.admin_client
-        client.update_token(config("write_token"))
-        return client
+                req = self.http.request("get", url, headers=headers, fields=params, retries=self.http_retries)
+            except urllib3.exceptions.HTTPError as e:
+                error = f"Could not connect to {url}: {e}"
+            else:
+                if req.status < 399:
+                    http_cache.put(url, params, req)
+                    return req
+                error = f"Could not connect to {url}. Received status {req.status}: {req.reason}"
+                if req.status not in retry_status:
+                    raise ConnectionError(error)
+                retry_after = parse_retry_after(req.headers.get("Retry-After"))
+            if attempt == limits.max_retries:
+                break
+            delay = limits.backoff_delay(attempt, retry_after)
+            logger.info(f"{error}. Retrying in {delay:.1f} seconds")
+            if retry_after is not None:
+                # Server asked to wait, so any other request to the same host will wait too in bucket.acquire
+                bucket.pause(delay)
+            else:
+                time.sleep(delay)
+        raise ConnectionError(error)
 
 
 class BaseDownloader(_HttpGet):
@@ -171,6 +194,13 @@ class BaseDownloader(_HttpGet):
     frequency = "C"  # Custom business day
     local_tz = "Europe/Madrid"
     date_format = "%Y-%m-%d"
+    max_concurrent_requests = 4  # Max number of dates being downloaded at the same time
+    dump_chunk_size = 30  # Initial number of downloaded dates stored together, then tuned by AdaptiveChunker
+    pipeline_queue_size = 2  # Max number of chunks waiting between download, transform and store stages
+    __ns_per_day = 86400 * 10 ** 9
+    # Stored maturities lower than this are days since epoch (year 4707), higher ones are seconds (data stored
+    # before maturities of daily data were stored as days, or data that is not daily)
+    __max_maturity_days = 1e6
 
     @property
     def is_daily_data(self) -> bool:
@@ -192,14 +222,38 @@ class BaseDownloader(_HttpGet):
         self.__roll_expirations = roll_expirations
         self.__name = name
         self.logger = logger
-        self.__client = None
+        self.__storage = None
         self.first_use = False
         self.__settlement_df = None
+        self.__read_only = False    # True if settlement_df is attached (see attach)
+        self.__coverage = None
+        self.__reset_lazy()
         self.cache = None
         self.last_data_ts = None
         self.__download_config = self._create_config(config_name, class_schema, default_config_field)
         self.__download_config_filter = list()
         self.set_force_download_filter(None)  # Initialize, just in case
+        self.journal = DownloadJournal(self.database, name)
+        self.empty_results = EmptyResultsCache(self.database, name)
+        self.snapshot = SettlementSnapshot(self.database, name)
+        self.shared_matrix = SharedSettlementMatrix(self.database, name)
+        # Max number of in-flight requests, can be configured per market in the config file
+        self.max_concurrent_requests = config("max_concurrent_requests", dict()).get(name,
+                                                                                     self.max_concurrent_requests)
+        # If True, prices of settlement_df are kept as float32 (as stored in the database) to save memory
+        self.compact_prices = bool(config("compact_prices", False))
+        # If True, maturities of daily data are stored as days since epoch instead of seconds. Versions that do not
+        # read days would read them as dates of 1970, so it is off until every reader of the database is upgraded
+        self.maturity_days = bool(config("maturity_days", False))
+
+    def _chunker(self, purpose: str, default_size: int, **kwargs) -> AdaptiveChunker:
+        """Returns an AdaptiveChunker for this market and the given purpose (e.g. "dump")"""
+        return AdaptiveChunker(f"{self.name()} {purpose}", default_size=default_size, **kwargs)
+
+    @property
+    def workers(self) -> WorkerPool:
+        """Pool of worker threads of this market, shared with any other downloader of the same market"""
+        return get_worker_pool(self.name(), self.max_concurrent_requests)
 
     @property
     def download_config(self):
@@ -228,8 +282,15 @@ class BaseDownloader(_HttpGet):
     def delete_all_data(self, do_not_ask: bool = False) -> bool:
         """Deletes the whole remote database. Ask for confirmation. Returns True if deleted"""
         if do_not_ask or ("yes" == input(f"Type 'yes' if you are sure to delete all {self.name()} data: ")):
-            if self._db_client_admin.delete_sensor(self.database, self.name()):
+            if self.storage.delete():
                 self.logger.info(f"Deleted all market data for '{self.name()}' from database '{self.database}'")
+                self.journal.clear()
+                self.empty_results.clear()
+                self.snapshot.clear()
+                self.shared_matrix.clear()
+                self.__settlement_df = None
+                self.__coverage = None
+                self.__reset_lazy()
                 self._verify_database()
                 return True
             else:
@@ -248,52 +309,43 @@ class BaseDownloader(_HttpGet):
         return retval
 
     @property
-    def _db_client_write(self) -> OngTsdbClient:
-        if not self.__client:
-            admin = self._db_client_admin  # Forces initialization of db is client write is used before client admin
-        return self.__client.write_client
-
-    @property
-    def _db_client_admin(self) -> OngTsdbClient:
-        """Creates a new admin client. If it is the first time or force_reload=False, creates the client,
-        the database and all the sensors"""
-
-        if self.__client is None:
-            self.__client = _OngTsdbClientManager(self.name())
+    def storage(self) -> StorageBackend:
+        """Storage backend of the market (configured with "storage_backend"). The first time it is used, it creates
+        the database and the sensor if needed"""
+        if self.__storage is None:
+            self.__storage = get_storage_backend(self.database, self.name(), self.period, self.local_tz)
             self._verify_database()
-        return self.__client.admin_client
+        return self.__storage
 
     def _verify_database(self):
         """Verifies that the database exists, setting up it if no"""
-        admin_client = self.__client.admin_client
-        if not admin_client.exist_db(self.database):
-            admin_client.create_db(self.database)
-        if not admin_client.exist_sensor(self.database, self.name()):
-            admin_client.create_sensor(self.database, self.name(), self.period, [],
-                                       config("read_token"), config("write_token"),
-                                       level_names=df_index_columns)
-        else:
-            if not admin_client.get_metadata(self.database, self.name()):
-                admin_client.set_level_names(self.database, self.name(), df_index_columns)
-        admin_client.config_reload()  # Forces config reload in case external changes found
+        self.storage.setup()
         self.date_last_data_ts()
         self.logger.info(f"Data for {self.name()} available up to {self.last_data_ts}")
 
     @property
     def settlement_df(self):
+        """All the data of the market. If compact_prices is True, prices are float32 (use settle_xs for float64)"""
         if self.__settlement_df is None:
             self.load()
         retval = self.__settlement_df
-        if not retval.empty and (retval.dtypes == np.float32).any():
-            columns_float_32 = retval.dtypes == np.float32
-            retval[columns_float_32].astype(str).astype(np.float64, inplace=True)
-            retval[columns_float_32].dtype = np.float64
+        if not self.compact_prices and not retval.empty and (retval.dtypes == np.float32).any():
+            retval = self.__settlement_df = widen_float32_columns(retval)
         return retval
 
+    def __compact(self, df: pd.DataFrame) -> pd.DataFrame:
+        """If compact_prices is True, returns df with its float64 columns converted to float32. As values are
+        stored as float32, no information is lost for stored data, and widen_float32 gets the float64 values back"""
+        if not self.compact_prices or df.empty:
+            return df
+        float64_columns = df.dtypes == np.float64
+        if not float64_columns.any():
+            return df
+        return df.astype({col: np.float32 for col in df.columns[float64_columns.to_numpy()]})
+
     def date_last_data_ts(self):
         """Returns last date (for any data in current database)"""
-        # Admin client must be used, as it fails if sensor does not exist so there are no permissions for getting date
-        last_date = self._db_client_write.get_lastdate(self.database, self.name())
+        last_date = self.storage.last_date()
         last_date = self.as_local_date(last_date)
         self.last_data_ts = last_date
         return self.last_data_ts
@@ -330,7 +382,7 @@ class BaseDownloader(_HttpGet):
             return False
 
     def maturity2timestamp(self, df: pd.DataFrame = None) -> pd.DataFrame:
-        """Converts maturity values to timestamp"""
+        """Converts maturity values to the values stored in the database (see maturity_values)"""
         return self.__maturity_to("timestamp", df)
 
     def maturity2datetime(self, df: pd.DataFrame = None) -> pd.DataFrame:
@@ -338,54 +390,69 @@ class BaseDownloader(_HttpGet):
         return self.__maturity_to("datetime", df)
 
     def __maturity_to(self, what: str, df: pd.DataFrame = None) -> pd.DataFrame:
-        """Converts inplace maturity values to timestamp (what='timestamp') or to datetime (what='datetime')"""
+        """Converts maturity values to timestamp (what='timestamp') or to datetime (what='datetime'). Just maturity
+        columns are converted: the rest of columns are shared with the original DataFrame, that is not modified"""
         is_settle = df is None
         df = self.__settlement_df if is_settle else df
         if df.empty:
             return df
-        index_maturity = df.columns.get_level_values('type') == 'maturity'
-        if not index_maturity.any():
+        index_maturity = np.flatnonzero(df.columns.get_level_values('type') == 'maturity')
+        dtypes = df.dtypes
+        converted = {pos: (self.__maturity_to_datetime if what == "datetime" else self.__maturity_to_timestamp)(
+            df.iloc[:, pos]) for pos in index_maturity if not self.check_dtype(what, dtypes.iloc[pos])}
+        if not converted:
             return df
-        maturity = df.loc[:, index_maturity]
-        if maturity.empty:
-            return df
-
-        def transform(value: pd.Timestamp | float) -> pd.Timestamp | float | None:
-            if what == "datetime":
-                if not pd.isna(value) and value > 0:
-                    # Value is rounded for storing less values and loses precision
-                    if self.period != "1D":
-                        # Round to 5 minutes intervals
-                        base = 300
-                        value = base * round(value / base)
-                    retval = self.as_local_date(pd.Timestamp.utcfromtimestamp(value))
-                    if self.period == "1D":
-                        return retval.normalize()
-                    else:
-                        return retval
-                return None
-            elif what == "timestamp":
-                if not pd.isna(value):  # and value > 0:
-                    return value.timestamp()
-                return None
-
-        # Perform the transformation of values, inplace
-        df_dtypes = df.dtypes
-        df = df.astype("object")  # To avoid problems with conversions
-        for col in df.columns[index_maturity]:
-            # df.loc[:, col].apply(lambda x: x*1e9).astype(dtypes[what]) # from ts to datetime
-            if not self.check_dtype(what, df_dtypes[col]):
-                new_col = df.loc[:, col].apply(transform)
-                df.loc[:, col] = new_col
-                df_dtypes[col] = new_col.dtype
-            # df = df.assign(**{col: df.loc[:, col].apply(transform)}) #.astype(dtypes[what]))
-        # convert dtypes back
-        df = df.astype(df_dtypes)
-
+        df = df.copy(deep=False)
+        for pos, values in converted.items():
+            df.isetitem(pos, values)
         if is_settle:
             self.__settlement_df = df
         return df
 
+    def maturity_values(self, maturity) -> np.ndarray:
+        """
+        Converts maturities (dates, naive dates are supposed to be in utc) to the float64 values stored in the
+        database: seconds since epoch or, for daily data with maturity_days, the number of days since epoch of the
+        local date (integers, exact when stored as float32). Missing dates are converted to NaN
+        """
+        dates = pd.DatetimeIndex(pd.to_datetime(maturity, utc=True)).as_unit("ns")
+        if self.is_daily_data and self.maturity_days:
+            ns = dates.tz_convert(self.local_tz).tz_localize(None).asi8
+            values = (ns // self.__ns_per_day).astype(np.float64)
+        else:
+            values = np.round(dates.asi8 / 1e9, 6)
+        values[dates.isna()] = np.nan
+        return values
+
+    def __maturity_to_datetime(self, maturity: pd.Series) -> pd.Series:
+        """Converts stored values (days or seconds since epoch) to dates in local tz. Values not positive are
+        converted to NaT"""
+        values = pd.to_numeric(maturity, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = values > 0
+        is_days = valid & (values < self.__max_maturity_days)
+        is_seconds = valid & ~is_days
+        nat = np.datetime64("NaT").astype(np.int64)
+        utc_ns = np.full(len(values), nat, dtype=np.int64)
+        if is_seconds.any():
+            seconds = values[is_seconds]
+            if self.period != "1D":
+                # Value is rounded for storing less values and loses precision. Round to 5 minutes intervals
+                base = 300
+                seconds = base * np.round(seconds / base)
+            # Timestamps have microsecond precision
+            utc_ns[is_seconds] = np.round(seconds * 1e6).astype(np.int64) * 1000
+        if is_days.any():
+            local_dates = pd.DatetimeIndex((values[is_days].astype(np.int64) * self.__ns_per_day).view("M8[ns]"))
+            utc_ns[is_days] = local_dates.tz_localize(self.local_tz).asi8
+        retval = pd.DatetimeIndex(utc_ns.view("M8[ns]")).tz_localize("utc").tz_convert(self.local_tz)
+        if self.period == "1D":
+            retval = retval.normalize()
+        return pd.Series(retval, index=maturity.index, name=maturity.name)
+
+    def __maturity_to_timestamp(self, maturity: pd.Series) -> pd.Series:
+        """Converts dates to the values stored in the database (see maturity_values)"""
+        return pd.Series(self.maturity_values(maturity), index=maturity.index, name=maturity.name)
+
     def settle_xs(self, allow_zero_prices: bool = True, market=None, commodity=None, instrument=None, area=None,
                   product=None, offset=None, type=None, maturity=None):
         """
@@ -408,27 +475,29 @@ class BaseDownloader(_HttpGet):
         maturity_value = None if "maturity" not in filter_ else pd.Timestamp(filter_.pop('maturity'))
         if all(col in filter_ for col in ("maturity", "offset")):
             raise ValueError("Cannot filter by offset and maturity at the same time")
-        if maturity_value:
+        # If settlement_df is not loaded, read just the columns that match the filter
+        all_columns = self.__lazy_columns() if not maturity_value and self.__settlement_df is None else None
+        if all_columns is not None:
+            filter_df = None
+        elif maturity_value:
             filter_df = self.settlement_df[
                 self.settlement_df.xs("maturity", level="type", axis=1) == maturity_value].dropna(axis=1, how="all")
         else:
             filter_df = self.settlement_df
+        # Maturity is removed if not explicitly asked for it
+        keep_maturity = bool(maturity_value) or "maturity" in (type or [])
         try:
-            retval = filter_df
-            for level, key in filter_.items():
-                if isinstance(key, (list, tuple)):
-                    # key = tuple(key)
-                    retval = retval.loc[:, retval.columns.get_level_values(level).isin(key)]
-                else:
-                    retval = retval.xs(key=key, level=level, axis=1, drop_level=False)
+            if filter_df is None:
+                columns = all_columns[self.__select_columns(all_columns, filter_, keep_maturity)]
+                retval = self.__read_columns(columns)
+            else:
+                retval = filter_df.iloc[:, self.__select_columns(filter_df.columns, filter_, keep_maturity)]
             if maturity_value:
                 names = list(retval.columns.names)
                 names.remove("offset")
                 retval = retval.T.groupby(level=names).sum().T
-            else:
-                # Remove maturity if not explicitly asked for it
-                if not "maturity" in (type or []):
-                    retval = retval.loc[:, retval.columns.get_level_values('type') != 'maturity']
+            # Prices are always returned as float64, even if kept as float32 in settlement_df
+            retval = widen_float32_columns(retval)
             if not allow_zero_prices:
                 retval[retval == 0] = None
             return retval
@@ -438,16 +507,84 @@ class BaseDownloader(_HttpGet):
             # level of the not found key
             failed_level = [k for (k, v) in filter_.items()
                             if (failed_key in v if isinstance(v, (list, tuple)) else failed_key == v)][0]
+            columns = all_columns if all_columns is not None else self.settlement_df.columns
             # the values available in the failed level
-            values_failed_level = self.settlement_df.columns.unique(failed_level).values
+            values_failed_level = columns.unique(failed_level).values
             # the level (if any) in which key was found
-            level_failed_key = list(v.name for v in
-                                    (self.settlement_df.columns.unique(l) for l in self.settlement_df.columns.names)
-                                    if failed_key in v)
+            level_failed_key = list(v.name for v in (columns.unique(l) for l in columns.names) if failed_key in v)
             raise FilterKeyNotFoundException(f"Key {failed_key} not found in level '{failed_level}' "
                                              f"with available values {values_failed_level}. "
                                              f"Key was found in level {level_failed_key}") from None
 
+    @staticmethod
+    def __select_columns(columns: pd.MultiIndex, filter_: dict, keep_maturity: bool = True) -> np.ndarray:
+        """Returns the positions of the columns that match the filter, a dict of level names and values (or lists of
+        values), and are not maturities unless keep_maturity. All filters are applied at once on the integer codes
+        of the levels. Raises KeyError if a value is not found (as in SeriesCatalog.xs_mask)"""
+        catalog = SeriesCatalog.of(columns)
+        mask = catalog.xs_mask(**filter_)
+        if not keep_maturity:
+            mask &= ~catalog.mask(type=[TypeColumn.maturity.value])
+        return np.flatnonzero(mask)
+
+    def __reset_lazy(self):
+        """Forgets the columns read without loading settlement_df"""
+        self.__lazy_tail = None
+        self.__lazy_tail_dates = None
+        self.__lazy_df = None
+        self.__lazy_snapshot_columns = None
+        self.__lazy_synced_to = None
+        self.__lazy_all_columns = None
+
+    def __lazy_columns(self) -> pd.MultiIndex | None:
+        """Returns all the columns that can be read without loading settlement_df, or None if they cannot be read
+        (there is no valid snapshot and the storage cannot read columns without reading all data)"""
+        if self.__lazy_all_columns is None:
+            if self.date_last_data_ts() is None:
+                return None
+            columns = self.snapshot.columns()
+            synced_to = self.as_local_date(self.snapshot.synced_to)
+            if columns is None or synced_to is None or synced_to > self.last_data_ts:
+                columns, synced_to = None, None
+            stored_columns = self.storage.columns()
+            if stored_columns is not None:
+                # Rows newer than the snapshot (all rows, if there is no snapshot) are read for each column when used
+                date_from = synced_to if synced_to is not None else self.as_local_date(self.min_date())
+                self.__lazy_tail_dates = self.storage.dates(date_from)
+                self.__lazy_all_columns = stored_columns if columns is None else stored_columns.union(columns)
+            elif columns is not None:
+                # Rows newer than the snapshot are read from database with all their columns
+                tail = self._read_database(synced_to)
+                self.__lazy_tail = tail[tail.index >= synced_to]
+                self.__lazy_all_columns = columns.union(self.__lazy_tail.columns)
+            else:
+                return None
+            self.__lazy_snapshot_columns = columns
+            self.__lazy_synced_to = synced_to
+        return self.__lazy_all_columns
+
+    def __read_columns(self, columns: pd.MultiIndex) -> pd.DataFrame:
+        """Reads the given columns from the snapshot and the database, keeping them for next calls"""
+        missing = columns if self.__lazy_df is None else columns.difference(self.__lazy_df.columns)
+        if len(missing):
+            synced_to = self.__lazy_synced_to
+            snapshot_df = None
+            if self.__lazy_snapshot_columns is not None:
+                snapshot_df, _ = self.snapshot.read([c for c in missing if c in self.__lazy_snapshot_columns])
+                if snapshot_df is None:
+                    # Snapshot is not valid anymore, fall back to the full data
+                    return self.settlement_df.loc[:, columns]
+            if self.__lazy_tail is not None:
+                tail = self.__lazy_tail
+            else:
+                date_from = synced_to if synced_to is not None else self.as_local_date(self.min_date())
+                # Rows without data in these columns are kept, as in settlement_df
+                tail = self._read_database(date_from, columns=missing).reindex(self.__lazy_tail_dates)
+            new_data = pd.concat([df.reindex(columns=missing) for df in (snapshot_df, tail) if df is not None])
+            new_data = self.maturity2datetime(new_data)
+            self.__lazy_df = new_data if self.__lazy_df is None else pd.concat([self.__lazy_df, new_data], axis=1)
+        return self.__lazy_df.loc[:, columns]
+
     def _pivot_table(self, df: pd.DataFrame, value_columns: list) -> pd.DataFrame:
         """Pivots a DataFrame to create Multiindex columns. Makes sure that the provided DataFrame
          has the required columns (those of df_index_columns plus "as_of" for the index plus the
@@ -498,10 +635,59 @@ class BaseDownloader(_HttpGet):
         pass
 
     def _iter_download_config(self):
-        """Returns an interator of configurations"""
+        """Returns an interator of configurations. While downloading an as_of date, returns just the
+        configurations that are missing for that date"""
+        config_ids = _as_of_config_ids.get()
         for config in self.__download_config:
             if config.download_cfg in self.__download_config_filter:
-                yield config
+                if config_ids is None or config.id() in config_ids:
+                    yield config
+
+    def _config_series_filter(self, cfg) -> dict:
+        """Returns a dict of level values that identify the series of settlement_df downloaded by the config. It can
+        also have a "maturity" key, for configs that share the same series and are told apart by the maturity of
+        their products (e.g. a config per futures contract)"""
+        retval = dict(market=self.name())
+        retval.update({k: v for k, v in cfg.commodity_cfg.__dict__.items() if v})
+        product = getattr(cfg.download_cfg, "product", None)
+        if product in valid_product:
+            retval['product'] = product
+        return retval
+
+    def _config_covered(self, cfg, as_of_dates, coverage: CoverageIndex, df: pd.DataFrame | None) -> np.ndarray:
+        """Returns a boolean array, True for the as_of dates that have data of the config in df (whose coverage
+        index is given). If the config filter has a maturity, just products with that maturity are checked"""
+        series_filter = self._config_series_filter(cfg)
+        maturity = series_filter.pop("maturity", None)
+        if maturity is None:
+            return coverage.covered(as_of_dates, coverage.series_mask(**series_filter))
+        dates = pd.DatetimeIndex(as_of_dates).normalize()
+        if df is None or df.empty:
+            return np.zeros(len(dates), dtype=bool)
+        catalog = SeriesCatalog.of(df.columns)
+        try:
+            positions = np.flatnonzero(catalog.mask(type=TypeColumn.maturity.value,
+                                                    **{k: v for k, v in series_filter.items() if k in catalog.names}))
+        except KeyError:
+            return np.zeros(len(dates), dtype=bool)
+        # Close of the same series of each maturity column
+        close_positions = df.columns.get_indexer([col[:-1] + (TypeColumn.close.value,)
+                                                  for col in df.columns[positions]])
+        positions, close_positions = positions[close_positions >= 0], close_positions[close_positions >= 0]
+        maturity = self.as_local_date(maturity)
+        if self.is_daily_data:
+            maturity = maturity.normalize()
+        matches = self.maturity2datetime(df.iloc[:, positions]).eq(maturity).to_numpy(dtype=bool) & \
+            df.iloc[:, close_positions].notna().to_numpy(dtype=bool)
+        covered = pd.Series(matches.any(axis=1), index=df.index.normalize())
+        return covered.groupby(level=0).any().reindex(dates, fill_value=False).to_numpy(dtype=bool)
+
+    @property
+    def coverage(self) -> CoverageIndex | None:
+        """Coverage index of settlement_df, or None if settlement_df is not loaded yet"""
+        if self.__coverage is None and self.__settlement_df is not None:
+            self.__coverage = CoverageIndex.from_dataframe(self.__settlement_df)
+        return self.__coverage
 
     def _divide_chunks(self, iterable, n: int) -> list:
         """Divides an iterable l into chunks of size n"""
@@ -510,9 +696,9 @@ class BaseDownloader(_HttpGet):
             yield iterable[i:i + n]
 
     def download(self, start_date: pd.Timestamp = None, end_date: pd.Timestamp = None,
-                 force_download: bool = False) -> int:
+                 force_download: bool = False, fill_gaps: bool = False) -> int:
         """
-        Downloads and stores data from a start date to an end date
+        Downloads and stores data from a start date to an end date. Synchronous version of adownload
         :param start_date:
         :param end_date:
         :param force_download: True to force download again data. Defaults to False (avoid downloading again).
@@ -520,36 +706,167 @@ class BaseDownloader(_HttpGet):
         as filter to download again just a specific set of commodities. Dict fields must be compatible with
         commodity_data.series_config.CommodityCfg dataclass. Example: force_download=dict(instrument="BL") will
         only download baseload products
+        :param fill_gaps: if True, dates older than the last stored date are also checked, and just the
+        (date, config) pairs that have no data in settlement_df are downloaded (e.g. for a new config or
+        an instrument that failed). Defaults to False
+        :return: the number of downloaded days
+        """
+        return _run_coroutine(self.adownload(start_date, end_date, force_download=force_download,
+                                             fill_gaps=fill_gaps))
+
+    def _max_concurrency(self) -> int:
+        """Returns the max number of dates that can be downloaded at the same time"""
+        # In case of debugging or if data comes from a cache, don't use concurrency
+        if self.cache is not None or is_debugging():
+            return 1
+        return max(1, self.max_concurrent_requests)
+
+    async def adownload(self, start_date: pd.Timestamp = None, end_date: pd.Timestamp = None,
+                        force_download: bool = False, fill_gaps: bool = False) -> int:
+        """
+        Downloads and stores data from a start date to an end date. Dates are downloaded concurrently (with at most
+        self.max_concurrent_requests requests in flight). Downloading, transforming and storing data work as a
+        pipeline: chunks of finished dates are transformed and written to the database while the
+        next chunks are still being downloaded. Chunk size starts at dump_chunk_size and is adapted from the observed
+        latency and size of downloaded dates. Writes are coalesced in a WriteBuffer, so small downloads are stored
+        with a single write, and data already downloaded is stored even if the download fails
+        :param start_date:
+        :param end_date:
+        :param force_download: same as in download
+        :param fill_gaps: same as in download
         :return: the number of downloaded days
         """
         start_date = self.as_local_date(start_date) or self.as_local_date(self.min_date())
         end_date = self.as_local_date(end_date) or self.today_local()
         self.set_force_download_filter(force_download)
-        retval = 0
         # If there is data already stored, unless force_download avoid downloading data older than 10 years
-        if self.date_last_data_ts() and not force_download:
-            start_date = max(start_date, self.last_data_ts,
+        if self.date_last_data_ts() and not force_download and not fill_gaps:
+            # If last download did not finish, resume it from its first date
+            resume_date = self.journal.pending_run[0] if self.journal.pending_run else self.last_data_ts
+            start_date = max(start_date, min(self.last_data_ts, resume_date),
                              self.today_local() - pd.offsets.YearBegin(10)).normalize()
         self._prepare_cache(start_date, end_date, force_download)
         ecb_hols = self._get_holidays(start_date, end_date)
         as_of_dates = pd.bdate_range(start_date, end_date, holidays=ecb_hols, freq=self.frequency)
-        # Divided in 20 chunks of equal size. Might not make sense for small
-        for as_of_chunk in self._divide_chunks(as_of_dates, n=30):
-            # In case of debugging, don't use multiprocessing
-            # map_func = map if self.cache is not None or is_debugging() else multiprocessing.Pool(4).map
-            map_func = map if self.cache is not None or is_debugging() else multiprocessing.pool.ThreadPool(4).map
-            # map_func = map      # No multiprocessing
-            dfs = list(map_func(self._download_date,
-                                (as_of for as_of in as_of_chunk
-                                 if force_download or as_of not in self.settlement_df.index)))
-            dfs = tuple(df for df in dfs if df is not None)  # Remove None entries
+        configs = list(self._iter_download_config())
+        plan = self._plan_download(as_of_dates, force_download, fill_gaps)
+        self.journal.start_run(start_date, end_date)
+        concurrency = self._max_concurrency()
+        chunker = self._chunker("dump", self.dump_chunk_size, concurrency=concurrency)
+        # Transform and store run in their own workers, so they never wait for downloads nor the other way round
+        pipeline_workers = get_worker_pool(f"{self.name()} pipeline", 2)
+        write_buffer = WriteBuffer(self._dump, self.name())
+        downloaded = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        transformed = asyncio.Queue(maxsize=self.pipeline_queue_size)
+
+        async def download_date(as_of: pd.Timestamp) -> pd.DataFrame | None:
+            # Download just the missing configs. Each task has its own context, so this does not affect other dates
+            _as_of_config_ids.set(plan[as_of])
+            start = time.monotonic()
+            try:
+                df = await self._adownload_date(as_of)
+            except Exception:
+                chunker.observe(1, time.monotonic() - start, errors=1)
+                raise
+            chunker.observe(1, time.monotonic() - start, values=0 if df is None else df.size)
+            requested = plan[as_of]
+            self._update_empty_results(as_of, [cfg for cfg in configs if requested is None or
+                                               cfg.id() in requested], df)
+            return df
+
+        tasks = set()  # dates being downloaded
+
+        async def download_stage():
+            """Downloads dates, with at most concurrency dates in flight, and puts chunks of finished dates in the
+            queue. New dates are started only when there is room, so if the queue is full downloads wait too"""
+            dates = iter(plan)
+            dfs = list()
+            while True:
+                while len(tasks) < concurrency and (as_of := next(dates, None)) is not None:
+                    tasks.add(asyncio.ensure_future(download_date(as_of)))
+                if not tasks:
+                    break
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                tasks.difference_update(done)
+                for task in done:
+                    if (df := task.result()) is not None:
+                        dfs.append(df)
+                if len(dfs) >= chunker.chunk_size:
+                    await downloaded.put(dfs)
+                    dfs = list()
             if dfs:
-                retval += len(dfs)
-                # Persist Data to hdfs. This is the not-thread-safe part
-                new_data = self.maturity2datetime(pd.concat(dfs))
-                if not new_data.empty:
-                    self.__settlement_df = _update_dataframe(self.__settlement_df, new_data)
-                    self._dump(new_data)
+                await downloaded.put(dfs)
+            await downloaded.put(None)
+
+        # Blocks already added to settlement_df but not to the write buffer. They are kept here (and not just in the
+        # queue) so they can be stored even if a stage fails, and memory and database do not diverge
+        unbuffered = collections.deque()
+        transforming = list()
+
+        def transform(dfs: list) -> bool:
+            blocks = self._transform_downloaded(dfs)
+            unbuffered.extend(blocks)
+            return bool(blocks)
+
+        async def transform_stage() -> int:
+            """Adds downloaded chunks to settlement_df. Returns the number of dates downloaded"""
+            n_dates = 0
+            while (dfs := await downloaded.get()) is not None:
+                n_dates += len(dfs)
+                transforming.append(pipeline_workers.submit(transform, dfs))
+                if await asyncio.wrap_future(transforming[-1]):
+                    await transformed.put(True)
+            await transformed.put(None)
+            return n_dates
+
+        def add_to_journal(config_dates: dict):
+            for cfg_id, dates in config_dates.items():
+                self.journal.add(dates, [cfg_id], save=False)
+            self.journal.save()
+
+        def buffer_block(new_data: pd.DataFrame):
+            # Just the configs with data are added to the journal, so configs that returned nothing are downloaded
+            # again (according to self.empty_results)
+            write_buffer.add(new_data, functools.partial(add_to_journal, self._config_dates(new_data, configs)))
+
+        def buffer_unbuffered(log_errors: bool = False):
+            while True:
+                try:
+                    new_data = unbuffered.popleft()
+                except IndexError:
+                    return
+                try:
+                    buffer_block(new_data)
+                except Exception as e:
+                    if not log_errors:
+                        raise
+                    self.logger.error(f"Could not buffer data of {self.name()}: {e}")
+
+        async def store_stage():
+            """Writes transformed chunks to the database. Dates are added to the journal once actually written"""
+            while await transformed.get() is not None:
+                await pipeline_workers.run(buffer_unbuffered)
+            await pipeline_workers.run(write_buffer.flush)
+
+        stages = [asyncio.ensure_future(stage()) for stage in (download_stage, transform_stage, store_stage)]
+        # Exiting the buffer writes any data still buffered if a stage fails
+        with write_buffer:
+            try:
+                # If any stage fails, stop the rest and raise its exception
+                done, pending = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+                for stage in done:
+                    stage.result()
+                retval = stages[1].result()
+                self.journal.finish_run()
+            finally:
+                for task in (*stages, *list(tasks)):
+                    task.cancel()
+                # If a stage failed, transforms still running in workers add their blocks to settlement_df, so wait
+                # for them and buffer every block not buffered yet, to be written when exiting the buffer
+                concurrent.futures.wait(transforming)
+                buffer_unbuffered(log_errors=True)
+                chunker.save()
+                self.empty_results.save()
         if retval and self.__roll_expirations:
             self.logger.info(f"Adjusting expirations for {self.__class__.__name__} {self.name()}")
             self.roll_expiration()
@@ -557,6 +874,97 @@ class BaseDownloader(_HttpGet):
         self._verify_database()  # Metadata might have been deleted...
         return retval
 
+    def _plan_download(self, as_of_dates: pd.DatetimeIndex, force_download: bool | dict | list = False,
+                       fill_gaps: bool = False) -> dict:
+        """
+        Returns the (as_of, config) pairs that have to be downloaded
+        :param as_of_dates: candidate dates
+        :param force_download: if not False, all dates are downloaded for all configs
+        :param fill_gaps: if True, uses the coverage of settlement_df (loading it if needed) to find missing pairs,
+        even if they are in the journal
+        Pairs known to have no data (see self.empty_results) are not downloaded again, unless force_download
+        :return: a dict with the as_of dates to download as keys and the set of ids of configs to download as
+        values (None to download all configs)
+        """
+        configs = list(self._iter_download_config())
+        if force_download:
+            return {as_of: None for as_of in as_of_dates}
+        if fill_gaps and self.__settlement_df is None:
+            self.load()
+        coverage = self.coverage
+        covered = dict()
+        for cfg in configs:
+            if coverage is not None:
+                covered[cfg.id()] = self._config_covered(cfg, as_of_dates, coverage, self.__settlement_df)
+            else:
+                # Without coverage, dates are supposed to be downloaded if they are older than the last stored date,
+                # unless they belong to an unfinished download
+                covered[cfg.id()] = [self.last_data_ts is not None and as_of <= self.last_data_ts and
+                                     not self.journal.in_pending_run(as_of) for as_of in as_of_dates]
+        # When filling gaps, a gap in coverage is downloaded even if the journal says it was stored
+        check_journal = not (fill_gaps and coverage is not None)
+        plan = dict()
+        for idx, as_of in enumerate(as_of_dates):
+            missing = set(cfg.id() for cfg in configs
+                          if not covered[cfg.id()][idx]
+                          and not (check_journal and self.journal.is_complete(as_of, [cfg.id()]))
+                          and not self.empty_results.is_empty(as_of, cfg.id()))
+            if missing:
+                plan[as_of] = None if len(missing) == len(configs) else missing
+        return plan
+
+    def _config_dates(self, df: pd.DataFrame | None, configs: list) -> dict:
+        """Returns a dict with the id of each config that has data in df as key and the (normalized) dates with
+        its data as value"""
+        if df is None or df.empty:
+            return dict()
+        if df.index.tz is None:
+            df = df.set_axis(df.index.tz_localize(self.local_tz))
+        coverage = CoverageIndex.from_dataframe(df)
+        dates = df.index.normalize().unique()
+        retval = dict()
+        for cfg in configs:
+            covered = self._config_covered(cfg, dates, coverage, df)
+            if covered.any():
+                retval[cfg.id()] = dates[covered]
+        return retval
+
+    def _update_empty_results(self, as_of: pd.Timestamp, configs: list, df: pd.DataFrame | None):
+        """Records in self.empty_results the configs that had no data in the DataFrame downloaded for as_of"""
+        with_data = self._config_dates(df, configs)
+        empty = [cfg.id() for cfg in configs if cfg.id() not in with_data]
+        self.empty_results.discard(as_of, list(with_data))
+        if empty:
+            self.logger.debug(f"No data found for {self.name()} on {self.as_of_str(as_of)} for {empty}")
+            self.empty_results.add(as_of, empty)
+
+    def _transform_downloaded(self, dfs: list) -> list:
+        """
+        Adds the downloaded dataframes to settlement_df. Returns a list of DataFrames with the new data, ready to be
+        stored. Dates with different columns (e.g. when just the missing configs were downloaded) are returned in
+        different DataFrames, so columns not downloaded are not stored as NaN. If settlement_df is loaded, just the
+        values that changed are returned
+        """
+        # This is the not-thread-safe part, it must not run concurrently
+        blocks = dict()
+        for df in dfs:
+            blocks.setdefault(tuple(df.columns), list()).append(df)
+        retval = list()
+        for block in blocks.values():
+            # Dates are downloaded concurrently, so they have to be sorted again
+            new_data = self.maturity2datetime(pd.concat(block).sort_index())
+            # If settlement_df was not loaded yet there is no need to update it: it will be read from the database
+            # (including the new data) the first time it is used
+            if self.__settlement_df is not None:
+                new_data = _delta_dataframe(self.__settlement_df, new_data)
+                if not new_data.empty:
+                    self.__settlement_df = self.__compact(_update_dataframe(self.__settlement_df, new_data))
+                    if self.__coverage is not None:
+                        self.__coverage.update(new_data)
+            if not new_data.empty:
+                retval.append(new_data)
+        return retval
+
     @classmethod
     def today_local(cls) -> pd.Timestamp:
         """Gets today date, localized and normalized"""
@@ -573,19 +981,15 @@ class BaseDownloader(_HttpGet):
             df = self.__settlement_df
         if df.empty:
             return True
+        self.snapshot.invalidate(df.index.min())
+        self.__reset_lazy()
         # write to database
         # Be careful with maturity: it cannot be saved as date and has to be converted to timestamp
-        df = self.maturity2timestamp(df)
-        if self.is_daily_data:
-            # Assume UTC for storing data properly
-            df.index = df.index.tz_localize(None)
+        df = self.maturity2timestamp(widen_float32_columns(df))
         msg = f"Writing data of size {df.shape} to database"
         self.logger.info(msg)
         with OngTimer(logger=self.logger, msg=msg, log_level=logging.INFO):
-            retval = self._db_client_write.write_df(self.database, self.name(), df, fill_value=np.nan)
-        if self.is_daily_data:
-            # Correct back time zone
-            df.index = df.index.tz_localize(self.local_tz)
+            retval = self.storage.write(df)
         if not retval:
             self.logger.error("Could not dump data")
             self.logger.info("Try to update proxy password using set_proxy_user_password() of commodity_data.common.py")
@@ -596,30 +1000,124 @@ class BaseDownloader(_HttpGet):
         """Deletes data from a specific date, by writing NaNs to all its values, including adjusted closes"""
         start_date = self.as_local_date(start_date)
         end_date = self.as_local_date(end_date)
-        all_data = self.settlement_df
+        all_data = self.__writable_settlement_df()
         all_data[start_date:end_date] = None
+        self.__coverage = None
         settle = all_data[start_date:end_date]
         dump_ok = self._dump(settle)
+        self.journal.remove(start_date, end_date)
         if dump_ok and reload:
             self.load()
 
-    def load(self):
-        """Loads settlement_df from database"""
+    def __writable_settlement_df(self) -> pd.DataFrame:
+        """Returns settlement_df to be modified in place. If it is attached (read-only), it is copied first"""
+        if self.__read_only:
+            self.__settlement_df = self.__settlement_df.copy()
+            self.__read_only = False
+        return self.settlement_df
+
+    def _read_database(self, date_from: pd.Timestamp, columns: pd.MultiIndex = None) -> pd.DataFrame:
+        """Reads data from database since date_from (just the given columns, if any), with index in local tz and
+        values as float64"""
+        return self.storage.read(date_from, columns=columns)
+
+    def load(self, since: pd.Timestamp | str = None):
+        """
+        Loads settlement_df from database
+        :param since: if given and settlement_df is already loaded, just data from this date is read and replaces
+        the data in memory from that date (data before it is kept). Otherwise, all data is loaded
+        :return: None
+        """
+        if since is not None and self.__settlement_df is not None:
+            self.__load_since(self.as_local_date(since))
+            return
+        self.__coverage = None
+        self.__read_only = False
+        self.__reset_lazy()
         if self.date_last_data_ts() is None:
             self.__settlement_df = pd.DataFrame(columns=pd.MultiIndex.from_arrays([[]] * len(df_index_columns),
                                                                                   names=df_index_columns))
         else:
-            read_data = self._db_client_write.read(self.database, self.name(), self.as_local_date(self.min_date()))
-            # convert to float64. Needs to be firstly converted to str to avoid losing precision
-            # index is read in utc. Convert to local tz if needed
-            if not read_data.index.tz:
-                read_data.index = read_data.index.tz_localize(self.local_tz)
-            if self.is_daily_data:
-                read_data.index = read_data.index.normalize()
-            self.__settlement_df = read_data.astype(str).astype(np.float64)
+            # Read from the server just the data newer than the local snapshot
+            snapshot_df, synced_to = self.snapshot.read()
+            synced_to = self.as_local_date(synced_to)
+            if synced_to is not None and synced_to > self.last_data_ts:
+                # Database has older data than the snapshot (e.g. it was deleted from another computer)
+                snapshot_df = None
+            date_from = synced_to if snapshot_df is not None else self.as_local_date(self.min_date())
+            read_data = self._read_database(date_from)
+            if snapshot_df is not None and not read_data.empty:
+                self.logger.debug(f"Read {len(snapshot_df)} rows of {self.name()} from snapshot and "
+                                  f"{len(read_data)} from database")
+                read_data = pd.concat([snapshot_df, read_data[read_data.index >= synced_to]])
+            elif snapshot_df is not None:
+                read_data = snapshot_df
+            self.__settlement_df = read_data
             self.__settlement_df.sort_index(inplace=True)
             self.__settlement_df.sort_index(inplace=True, axis=1)
+            # Last date is read again next time, in case it was not complete. The snapshot is written just if that
+            # date is newer than the one of the snapshot, otherwise it would be written again with the same data
+            if not self.__settlement_df.empty and (snapshot_df is None or self.__settlement_df.index[-1] > synced_to):
+                self.snapshot.write(self.__settlement_df, self.__settlement_df.index[-1])
             self.maturity2datetime()
+            self.__settlement_df = self.__compact(self.__settlement_df)
+
+    def __load_since(self, since: pd.Timestamp) -> int:
+        """Replaces data of settlement_df from since with the data read from database. Returns number of new rows"""
+        self.date_last_data_ts()
+        tail = self._read_database(since)
+        tail = tail[tail.index >= since]
+        if tail.empty:
+            return 0
+        tail = self.__compact(self.maturity2datetime(tail.sort_index()))
+        settlement_df = self.__settlement_df
+        kept = settlement_df[settlement_df.index < since]
+        n_new_rows = len(tail) - (len(settlement_df) - len(kept))
+        new_columns = not tail.columns.isin(settlement_df.columns).all()
+        # Empty columns of tail (e.g. maturity of a product not quoted) must have the same dtypes as in settlement_df
+        empty_columns = tail.columns[tail.isna().all() & tail.columns.isin(settlement_df.columns)]
+        tail = tail.astype({col: settlement_df.dtypes[col] for col in empty_columns
+                            if tail.dtypes[col] != settlement_df.dtypes[col]})
+        # As tail is sorted and newer than kept, there is no need to sort rows again
+        settlement_df = pd.concat([kept, tail])
+        if new_columns:
+            settlement_df.sort_index(inplace=True, axis=1)
+        self.__settlement_df = settlement_df
+        self.__read_only = False
+        self.__coverage = None
+        return n_new_rows
+
+    def refresh(self) -> int:
+        """
+        Updates settlement_df with the data stored in the database after the last date in memory (the last
+        date is read again, as it might have been incomplete). Loads all data if settlement_df was not loaded
+        :return: the number of new rows (as_of dates) added
+        """
+        if self.__settlement_df is None or self.__settlement_df.empty:
+            self.load()
+            return len(self.__settlement_df)
+        return self.__load_since(self.__settlement_df.index[-1])
+
+    def publish(self):
+        """Publishes settlement_df (loading it if needed), so other processes of the same host can use it with
+        attach() without loading it. Call it again to publish newer data"""
+        self.shared_matrix.publish(widen_float32_columns(self.settlement_df))
+
+    def attach(self) -> bool:
+        """
+        Uses as settlement_df the data published by another process. Data is read-only and shared with the rest of
+        processes attached to it, not copied. Methods that change data (such as refresh, download or delete_dates)
+        replace it with a copy in memory
+        :return: True if attached, False if there was no published data
+        """
+        df = self.shared_matrix.attach()
+        if df is None:
+            return False
+        self.__settlement_df = df
+        self.__read_only = True
+        self.__coverage = None
+        self.__reset_lazy()
+        return True
 
     def roll_expiration(self, roll_offset=0, valid_products: list = None, valid_commodities: list = None,
                         valid_areas: list = None) -> None:
@@ -645,20 +1143,28 @@ class BaseDownloader(_HttpGet):
                                                     valid_products=valid_products, valid_commodities=valid_commodities,
                                                     valid_areas=valid_areas)
 
-        diff_columns = [c for c in settlement_df.columns if c not in self.settlement_df or
-                        (settlement_df[c].fillna(0) != self.settlement_df[c].fillna(0)).any()]
-        if diff_columns:
+        # Just the values that changed (usually the last dates) are stored
+        changes = _delta_dataframe(self.settlement_df, settlement_df)
+        if not changes.empty:
             # Update with the changes
-            self.__settlement_df = settlement_df
-            # Append all rollings at the same time to avoid performance warning due to heavy fragmentation
-
-            self._dump(self.__settlement_df[diff_columns])  # Full dump due to rolling adjustments
+            self.__settlement_df = self.__compact(settlement_df)
+            self._dump(changes)
         return None
 
     @abc.abstractmethod
     def _download_date(self, as_of: pd.Timestamp) -> pd.DataFrame:
         pass
 
+    async def _adownload_date(self, as_of: pd.Timestamp) -> pd.DataFrame | None:
+        """
+        Async version of _download_date, used by adownload. By default, runs _download_date in a worker thread,
+        so blocking http requests do not stop the event loop. Override it in child classes with a native coroutine
+        if available
+        :param as_of: date to download
+        :return: a pivoted DataFrame (as in _download_date) or None if no data was found
+        """
+        return await self.workers.run(self._download_date, as_of)
+
     def as_of_str(self, as_of) -> str:
         """Formats a date to str using self.date_format"""
         if isinstance(as_of, str):
@@ -0,0 +1,100 @@
+"""
+Integer coded catalog of the columns of a settlement_df.
+Each column of settlement_df is a tuple with the levels of df_index_columns. Selecting columns with
+get_level_values, xs or groupby materializes and hashes those tuples on every call. The catalog computes once, for
+each column, the integer code of each of its levels, so column selection and grouping are numpy operations on small
+integer arrays. Results are positions of columns, to be used with df.iloc, so DataFrames keep their MultiIndex
+columns for the API. Series have no id of their own: they are the groups of columns by all the levels but "type"
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class SeriesCatalog:
+    """Integer codes of the levels of a MultiIndex of columns"""
+    __cache = dict()  # id of columns -> catalog, for the last catalogs created with of()
+    __cache_lock = threading.Lock()
+    cache_size = 16
+
+    def __init__(self, columns: pd.MultiIndex):
+        self.columns = columns
+        self.names = list(columns.names)
+        # Levels with just the values used, so they can be reported as available values
+        used = columns.remove_unused_levels() if len(columns) else columns
+        self.levels = list(used.levels)
+        # codes[i] are the codes in self.levels[i] of the values of level i for each column
+        self.codes = np.vstack([np.asarray(c, dtype=np.int32) for c in used.codes]) if len(columns) \
+            else np.zeros((len(self.names), 0), dtype=np.int32)
+
+    @classmethod
+    def of(cls, columns: pd.MultiIndex) -> "SeriesCatalog":
+        """Returns the catalog of columns, reusing the one created for the same columns object, if any"""
+        with cls.__cache_lock:
+            catalog = cls.__cache.get(id(columns))
+            if catalog is None or catalog.columns is not columns:
+                catalog = cls(columns)
+                if len(cls.__cache) >= cls.cache_size:
+                    cls.__cache.pop(next(iter(cls.__cache)))
+                cls.__cache[id(columns)] = catalog
+            return catalog
+
+    def __len__(self):
+        return len(self.columns)
+
+    def level_position(self, level: str) -> int:
+        return self.names.index(level)
+
+    def level_values(self, level: str) -> np.ndarray:
+        """Values of the level for each column (as get_level_values, but without building an Index)"""
+        pos = self.level_position(level)
+        return self.levels[pos].to_numpy()[self.codes[pos]]
+
+    def level_codes(self, level: str, values) -> np.ndarray:
+        """Codes of the given values of a level. Raises KeyError for a scalar value that is not found, values of
+        lists or tuples not found are ignored"""
+        level_index = self.levels[self.level_position(level)]
+        is_list = isinstance(values, (list, tuple, set, np.ndarray, pd.Index))
+        codes = level_index.get_indexer(list(values) if is_list else [values])
+        if not is_list and codes[0] < 0:
+            raise KeyError(values)
+        return codes[codes >= 0]
+
+    def mask(self, **filter_) -> np.ndarray:
+        """Boolean array of the columns that match all the given level values (scalars or lists of values).
+        Levels with None values are not filtered. Raises KeyError if a scalar value is not found"""
+        mask = np.ones(len(self), dtype=bool)
+        for level, values in filter_.items():
+            if values is None:
+                continue
+            level_codes = self.codes[self.level_position(level)]
+            codes = self.level_codes(level, values)
+            mask &= level_codes == codes[0] if len(codes) == 1 else np.isin(level_codes, codes)
+        return mask
+
+    def xs_mask(self, **filter_) -> np.ndarray:
+        """As mask, but raising KeyError for the first scalar value that leaves no columns selected, as applying
+        filters one by one with DataFrame.xs does (values of lists are not checked)"""
+        mask = np.ones(len(self), dtype=bool)
+        for level, values in filter_.items():
+            if values is None:
+                continue
+            mask &= self.mask(**{level: values})
+            if not isinstance(values, (list, tuple, set, np.ndarray, pd.Index)) and not mask.any():
+                raise KeyError(values)
+        return mask
+
+    def groups(self, levels: list, mask: np.ndarray = None) -> dict:
+        """Returns a dict with the tuple of values of the given levels as key and the positions of the columns
+        with those values as value (just for the masked columns, if mask is given)"""
+        pos = [self.level_position(level) for level in levels]
+        positions = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        if not len(positions):
+            return dict()
+        keys, inverse = np.unique(self.codes[pos][:, positions], axis=1, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        splits = np.split(positions[order], np.flatnonzero(np.diff(inverse[order])) + 1)
+        return {tuple(self.levels[p][code] for p, code in zip(pos, key)): group
+                for key, group in zip(keys.T, splits)}
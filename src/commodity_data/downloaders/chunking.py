@@ -0,0 +1,95 @@
+"""
+Adaptive chunk sizes for downloaders.
+Instead of a fixed number of dates per chunk, chunk size is tuned from the observed latency of each downloaded
+item, the number of values it produced and the error rate, so fast sources (e.g. Omip) use large chunks and slow
+or heavy ones (e.g. EEX chains, Esios hourly series) use small chunks.
+What is learned is stored in a cache file, so next runs start with the already tuned sizes
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+from commodity_data.globals import logger
+
+
+class AdaptiveChunker:
+    """Computes the chunk size for a given key (e.g. "Omip dump") from the observed throughput"""
+    cache_file = Path.home() / ".cache" / "ongpi" / "adaptive_chunks.json"
+    alpha = 0.3  # Weight of new observations in the exponential moving averages
+    __lock = threading.Lock()
+
+    def __init__(self, key: str, default_size: int, target_seconds: float = 60, target_values: int = 50_000,
+                 min_size: int = 1, max_size: int = 250, concurrency: int = 1):
+        """
+        Creates a chunker, reading previous observations of the key from cache file
+        :param key: name used to store observations. Use different keys for different data sources/uses
+        :param default_size: chunk size to be used while there are no observations
+        :param target_seconds: expected time for downloading a full chunk
+        :param target_values: expected number of values (rows x columns) in a full chunk
+        :param min_size: minimum chunk size
+        :param max_size: maximum chunk size
+        :param concurrency: number of items downloaded at the same time
+        """
+        self.key = key
+        self.default_size = default_size
+        self.target_seconds = target_seconds
+        self.target_values = target_values
+        self.min_size = min_size
+        self.max_size = max_size
+        self.concurrency = max(1, concurrency)
+        self.state = self.__read_cache().get(key, dict())
+
+    @classmethod
+    def __read_cache(cls) -> dict:
+        try:
+            return json.loads(cls.cache_file.read_text())
+        except (OSError, ValueError):
+            return dict()
+
+    def __average(self, name: str, value: float):
+        previous = self.state.get(name)
+        self.state[name] = value if previous is None else (1 - self.alpha) * previous + self.alpha * value
+
+    def observe(self, n_items: int, elapsed: float, values: int = 0, errors: int = 0):
+        """
+        Records an observation
+        :param n_items: number of items (e.g. dates) downloaded
+        :param elapsed: seconds spent downloading the items (each of them, not in parallel)
+        :param values: number of values obtained (e.g. the size of the downloaded DataFrames)
+        :param errors: number of items that failed
+        """
+        if n_items <= 0:
+            return
+        with self.__lock:
+            self.__average("latency", elapsed / n_items)
+            self.__average("values", values / n_items)
+            self.__average("error_rate", errors / n_items)
+            self.state['observations'] = self.state.get('observations', 0) + n_items
+
+    @property
+    def chunk_size(self) -> int:
+        """Returns the chunk size for the current observations"""
+        if not self.state.get("observations"):
+            return self.default_size
+        sizes = [self.max_size]
+        if latency := self.state.get("latency"):
+            sizes.append(self.target_seconds * self.concurrency / latency)
+        if values := self.state.get("values"):
+            sizes.append(self.target_values / values)
+        # Reduce chunks when errors are found, so less work is lost
+        size = min(sizes) * (1 - min(0.9, self.state.get("error_rate", 0)))
+        return int(max(self.min_size, min(self.max_size, size)))
+
+    def save(self):
+        """Stores observations in the cache file, replacing the file atomically"""
+        with self.__lock:
+            try:
+                cache = self.__read_cache()
+                cache[self.key] = dict(self.state, chunk_size=self.chunk_size)
+                self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+                tmp_file.write_text(json.dumps(cache, indent=2))
+                os.replace(tmp_file, self.cache_file)
+            except OSError as e:
+                logger.warning(f"Could not save chunk sizes to {self.cache_file}: {e}")
@@ -5,6 +5,8 @@ This will calculate the adj_close column of settlement_df
 import numpy as np
 import pandas as pd
 
+from commodity_data.downloaders.catalog import SeriesCatalog
+from commodity_data.downloaders.numeric import widen_float32_columns
 from commodity_data.downloaders.series_config import TypeColumn, df_index_columns
 from commodity_data.globals import logger
 
@@ -47,12 +49,14 @@ def calculate_continuous_prices(settlement_df: pd.DataFrame, valid_products: lis
     :param roll_offset: number of business days for performing offset
     :return: a new pandas DataFrame with the adj_close calculated for the valid
     """
-    valid_columns = settlement_df.columns.get_level_values('offset') > 0
+    catalog = SeriesCatalog.of(settlement_df.columns)
+    valid_columns = catalog.level_values('offset') > 0
+    types = catalog.level_values('type')
+    offsets = catalog.level_values('offset')
     df_rolls = list()
-    for (market, commodity, area, product), group_t in settlement_df.loc[:, valid_columns].T.groupby(
-            ["market", "commodity", "area", "product"]):
-        product = group_t.index.get_level_values("product")[0]
-        index = group_t.index[0]
+    for (market, commodity, area, product), positions in catalog.groups(
+            ["market", "commodity", "area", "product"], valid_columns).items():
+        index = settlement_df.columns[positions[0]]
         if (
                 (valid_products and product not in valid_products) or
                 (valid_commodities and commodity not in valid_commodities) or
@@ -61,35 +65,38 @@ def calculate_continuous_prices(settlement_df: pd.DataFrame, valid_products: lis
             logger.info(f"Skipping rolling of {index[:-1]}")
             continue
         logger.info(f"Processing rolling of {index[:-1]}")
-        # As groupby with axis is deprecated, it has to be manually transposed back
-        group = group_t.T
+        group = settlement_df.iloc[:, positions]
         # Drop rows with nans, as they have to be skipped
-        group = group.dropna(how="all")
-        # Just type=close in the group (ignoring any other type)
-        group_close = group.xs(TypeColumn.close, level="type", axis=1, drop_level=False).astype(float)
-        if group_close.empty:
+        rows = group.notna().to_numpy().any(axis=1)
+        # Just type=close in the group (ignoring any other type), as a 2-D array with a column per offset. Float32
+        # prices (see compact_prices) are widened, so rolls do not have float32 artifacts
+        close_positions = positions[types[positions] == TypeColumn.close.value]
+        maturity_positions = positions[types[positions] == TypeColumn.maturity.value]
+        closes = widen_float32_columns(settlement_df.iloc[rows, close_positions]).to_numpy(dtype=float,
+                                                                                          na_value=np.nan)
+        if not closes.size:
             logger.info(f"Skipping {index[:-1]}: no data available")
             continue
-        group_maturity = group.xs(TypeColumn.maturity, level="type", axis=1, drop_level=False)
+        dates = settlement_df.index[rows]
+        close_column = {offset: col for col, offset in enumerate(offsets[close_positions])}
+        maturity_position = dict(zip(offsets[maturity_positions], maturity_positions))
         # Take offsets from the last row of available data
-        max_offset = group_close.iloc[-1,
-        np.argwhere(~group_close.iloc[-1].isna()).flatten()  # not null columns
-        ].index.get_level_values('offset').max()
-        for offset in range(1, int(max_offset)):
-            # df_prod_0 = group_close.loc[:,
-            #             column_idx(index, offset=offset, type=TypeColumn.close.value)]
-            # df_prod_1 = group_close.loc[:,
-            #             column_idx(index, offset=offset + 1, type=TypeColumn.close.value)]
-            # expirations = np.argwhere(np.diff(product_to_date(df_prod_0.index, product)) != 0).flatten()
-            df_prod_0 = group_close.xs(offset, level="offset", axis=1, drop_level=False)
-            df_prod_1 = group_close.xs(offset + 1, level="offset", axis=1, drop_level=False)
+        last_offsets = offsets[close_positions][~np.isnan(closes[-1])]
+        if not len(last_offsets):
+            logger.info(f"Skipping {index[:-1]}: no data available in the last date")
+            continue
+        for offset in range(1, int(last_offsets.max())):
+            if offset not in close_column or offset + 1 not in close_column or offset not in maturity_position:
+                logger.info(f"Skipping offset {offset} of {index[:-1]}: no data available")
+                continue
             # use change in product maturities to calculate expirations
-            expirations = np.argwhere(group_maturity.xs(offset, level="offset", axis=1).iloc[:, 0]
-                                      .infer_objects(copy=False)
-                                      .bfill().diff().dt.days > 0).flatten()
-            # df_prod_1 should not have nans, so fill them
-            roll_values = roll(df_prod_0.values.flatten(), df_prod_1.ffill().values.flatten(), expirations, roll_offset)
-            df_roll = pd.Series(roll_values.flatten(), index=df_prod_0.index,
+            maturity = settlement_df.iloc[rows, maturity_position[offset]]
+            expirations = np.argwhere(maturity.infer_objects(copy=False).bfill().diff().dt.days > 0).flatten()
+            # price of next product should not have nans, so fill them
+            roll_values = roll(closes[:, close_column[offset]],
+                               pd.Series(closes[:, close_column[offset + 1]]).ffill().to_numpy(),
+                               expirations, roll_offset)
+            df_roll = pd.Series(roll_values, index=dates,
                                 name=column_idx(index, offset=offset, type=continuous_price_type))
             df_rolls.append(df_roll)
     ns = settlement_df.columns.names
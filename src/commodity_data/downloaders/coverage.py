@@ -0,0 +1,73 @@
+"""
+Coverage index of settlement data: a bitmap with one row per as_of date and one column per series (all the levels
+of settlement_df columns but "type"), that is True where there is a close price.
+It is used to find the (as_of, config) pairs that are missing and have to be downloaded
+"""
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.series_config import TypeColumn, df_index_columns
+
+
+class CoverageIndex:
+    """Bitmap of available prices, with as_of dates as rows and series as columns"""
+
+    def __init__(self, dates: pd.DatetimeIndex, series: pd.MultiIndex, bitmap: np.ndarray):
+        self.dates = dates
+        self.series = series
+        self.bitmap = bitmap
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame | None, value_type: str = TypeColumn.close.value) -> "CoverageIndex":
+        """Creates the coverage from a settlement_df like DataFrame. For intraday data, dates are normalized so
+        a date is covered if any of its values is available"""
+        if df is None or df.empty:
+            series = pd.MultiIndex.from_tuples([], names=[c for c in df_index_columns if c != "type"])
+            return cls(pd.DatetimeIndex([]), series, np.zeros((0, 0), dtype=bool))
+        values = df.loc[:, df.columns.get_level_values("type") == value_type]
+        available = values.notna()
+        dates = values.index.normalize()
+        if not dates.is_unique:
+            available = available.groupby(dates).any()
+            dates = available.index
+        return cls(pd.DatetimeIndex(dates), values.columns.droplevel("type"), available.to_numpy(dtype=bool))
+
+    @property
+    def empty(self) -> bool:
+        return self.bitmap.size == 0
+
+    def __reindex(self, dates: pd.DatetimeIndex, series: pd.MultiIndex) -> np.ndarray:
+        """Returns the bitmap for the given dates and series (that must include the current ones)"""
+        bitmap = np.zeros((len(dates), len(series)), dtype=bool)
+        bitmap[np.ix_(dates.get_indexer(self.dates), series.get_indexer(self.series))] = self.bitmap
+        return bitmap
+
+    def update(self, new_data: pd.DataFrame):
+        """Adds the values available in new_data (a DataFrame like settlement_df) to the coverage"""
+        other = new_data if isinstance(new_data, CoverageIndex) else self.from_dataframe(new_data)
+        if other.empty:
+            return
+        if self.empty:
+            self.dates, self.series, self.bitmap = other.dates, other.series, other.bitmap
+            return
+        dates = self.dates.union(other.dates)
+        series = self.series.union(other.series)
+        self.bitmap = self.__reindex(dates, series) | other.__reindex(dates, series)
+        self.dates, self.series = dates, series
+
+    def series_mask(self, **levels) -> np.ndarray:
+        """Returns a boolean array of the series that match the given level values"""
+        mask = np.ones(len(self.series), dtype=bool)
+        for level, value in levels.items():
+            if level in self.series.names:
+                mask &= self.series.get_level_values(level) == value
+        return mask
+
+    def covered(self, as_of_dates, series_mask: np.ndarray) -> np.ndarray:
+        """Returns a boolean array, True for each as_of date that has data in any of the masked series"""
+        rows = self.dates.get_indexer(pd.DatetimeIndex(as_of_dates).normalize()) if not self.empty \
+            else np.full(len(as_of_dates), -1)
+        retval = np.zeros(len(rows), dtype=bool)
+        found = rows >= 0
+        retval[found] = self.bitmap[rows[found]][:, series_mask].any(axis=1)
+        return retval
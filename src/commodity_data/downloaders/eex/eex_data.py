@@ -27,6 +27,7 @@ def get_js_var(var_name: str, where: str) -> str:
 class EEXData(_HttpGet):
     """Class to get market data from eex"""
 
+    http_limits_name = "EEX"
     format_year_month_day = "%Y/%m/%d"  # Date format of other date: year/month/day
     format_month_day_year = "%m/%d/%Y"  # Date format for global vision dates, moth/day/year
     commodities = "power", "natural-gas", "environmentals", "agriculturals", "freight"
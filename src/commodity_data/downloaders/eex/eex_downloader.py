@@ -53,8 +53,8 @@ class EEXDownloader(BaseDownloader):
                                                                                    ))
             # Removes outliers
             table = self.remove_outliers(table, symbol=download_cfg.instrument, date=as_of)
-            # Convert maturities to timestamps
-            table['maturity'] = table['maturity'].apply(lambda x: x.timestamp())
+            # Convert maturities to the values stored in the database
+            table['maturity'] = self.maturity_values(table['maturity'])
             # table.drop(columns=['maturity'], inplace=True)
             # table.set_index(df_index_columns, inplace=True)
             table.drop(columns=list(set(table.columns) - set(list([*df_index_columns, 'close', 'maturity']))),
@@ -0,0 +1,95 @@
+"""
+Local cache of downloads known to return no data (negative cache).
+Some dates never have data for a config (e.g. exchange holidays not included in holidays.EuropeanCentralBank, an
+Omip page without tables or an EEX chain without closes), so they never reach settlement_df and would be
+downloaded again in every run.
+For each market it stores the (as_of, config id) pairs that returned no data and the date they were checked.
+Those pairs are not downloaded again unless the check was too close to the as_of date (data might have been
+published later) or the check is too old. Both periods can be configured in the config file:
+    empty_results:
+        recheck_days: 5     # empty results checked less than 5 days after as_of are checked again
+        ttl_days: 365       # empty results are checked again after 365 days. Use null to never check them again
+The cache is a json file per market that is replaced atomically on each update
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from commodity_data.globals import logger, config
+
+
+class EmptyResultsCache:
+    """Cache of (as_of, config id) pairs that were downloaded and had no data for a market"""
+    cache_dir = Path.home() / ".cache" / "ongpi" / "empty_results"
+    date_format = "%Y-%m-%d"
+    recheck_days = 5
+    ttl_days = 365
+
+    def __init__(self, database: str, name: str):
+        self.file = self.cache_dir / f"{database}_{name}.json"
+        self.__lock = threading.Lock()
+        self.empty = dict()  # config id -> dict of as_of date -> date of the check, both formatted as str
+        policy = config("empty_results", dict()) or dict()
+        self.recheck_days = policy.get("recheck_days", self.recheck_days)
+        self.ttl_days = policy.get("ttl_days", self.ttl_days)
+        self.__read()
+
+    def __read(self):
+        try:
+            self.empty = json.loads(self.file.read_text())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring invalid empty results cache {self.file}: {e}")
+
+    def save(self):
+        """Writes the cache to disk, replacing the previous file atomically"""
+        with self.__lock:
+            try:
+                self.file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = self.file.with_suffix(f".{os.getpid()}.tmp")
+                tmp_file.write_text(json.dumps(self.empty))
+                os.replace(tmp_file, self.file)
+            except OSError as e:
+                logger.warning(f"Could not save empty results cache {self.file}: {e}")
+
+    def __key(self, date: pd.Timestamp) -> str:
+        return date.strftime(self.date_format)
+
+    def is_empty(self, as_of: pd.Timestamp, cfg_id: str, today: pd.Timestamp = None) -> bool:
+        """True if as_of is known to have no data for the config and does not need to be checked again"""
+        checked = self.empty.get(cfg_id, dict()).get(self.__key(as_of))
+        if checked is None:
+            return False
+        checked = pd.Timestamp(checked)
+        as_of = pd.Timestamp(self.__key(as_of))
+        if (checked - as_of).days < self.recheck_days:
+            return False
+        if self.ttl_days is not None:
+            today = pd.Timestamp(self.__key(today or pd.Timestamp.today()))
+            if (today - checked).days >= self.ttl_days:
+                return False
+        return True
+
+    def add(self, as_of: pd.Timestamp, cfg_ids: list, today: pd.Timestamp = None):
+        """Marks as_of as having no data for the given config ids. Call save() to store it"""
+        key, checked = self.__key(as_of), self.__key(today or pd.Timestamp.today())
+        with self.__lock:
+            for cfg_id in cfg_ids:
+                self.empty.setdefault(cfg_id, dict())[key] = checked
+
+    def discard(self, as_of: pd.Timestamp, cfg_ids: list):
+        """Removes as_of from the cache for the given config ids (e.g. because data was found)"""
+        key = self.__key(as_of)
+        with self.__lock:
+            for cfg_id in cfg_ids:
+                self.empty.get(cfg_id, dict()).pop(key, None)
+
+    def clear(self):
+        """Removes everything from the cache"""
+        with self.__lock:
+            self.empty = dict()
+        self.save()
@@ -1,3 +1,5 @@
+import time
+
 import numpy as np
 import pandas as pd
 
@@ -36,32 +38,44 @@ class EsiosDownloader(BaseDownloader):
         if self.cache is None:
             self.cache = dict()
         all_dates = pd.date_range(start_date, end_date, freq=self.frequency)
+        # Starts with 30 days/1 month chunks, then adapted to observed download times
+        chunker = self._chunker("cache", 30, target_seconds=30, max_size=90,
+                                concurrency=self.workers.max_workers)
         for config in self.download_config:
             indicator = config.download_cfg.indicator
             if indicator not in self.cache:
-                dfs = list()
-                for chunk in self._divide_chunks(all_dates, n=30):  # 30 days/1 month
-                    download_start = self.normalize_date(chunk[0])
-                    download_end = self.normalize_date(chunk[-1], hour=23, minute=45)
-                    self.logger.info(f"Downloading esios data {indicator=} {download_start=} {download_end=}")
-                    df = self.esios.download_by(id=indicator, date=[download_start, download_end])
-                    # df = dict()
-                    if df is None:
-                        # There was an error in the download...retry unless we are trying a single day
-                        raise EsiosDownloadError(f"Could not download data for {indicator=} {download_start=} "
-                                                 f"{download_end=}")
-                    else:
-                        dfs.append(df)
+                chunks = list(self._divide_chunks(all_dates, n=chunker.chunk_size))
+                try:
+                    dfs = self.workers.map(lambda chunk: self._download_chunk(indicator, chunk, chunker), chunks)
+                finally:
+                    chunker.save()
                 if dfs:
                     self.cache[indicator] = pd.concat(dfs, axis=0)
         pass
 
+    def _download_chunk(self, indicator: int, chunk: pd.DatetimeIndex, chunker=None) -> pd.DataFrame:
+        """Downloads data of an indicator for the dates of the chunk. If a chunker is given, informs it of
+        the download time and size"""
+        start = time.monotonic()
+        download_start = self.normalize_date(chunk[0])
+        download_end = self.normalize_date(chunk[-1], hour=23, minute=45)
+        self.logger.info(f"Downloading esios data {indicator=} {download_start=} {download_end=}")
+        df = self.esios.download_by(id=indicator, date=[download_start, download_end])
+        if chunker is not None:
+            chunker.observe(len(chunk), time.monotonic() - start, values=0 if df is None else df.size,
+                            errors=len(chunk) if df is None else 0)
+        if df is None:
+            # There was an error in the download...retry unless we are trying a single day
+            raise EsiosDownloadError(f"Could not download data for {indicator=} {download_start=} "
+                                     f"{download_end=}")
+        return df
+
     def _download_date(self, as_of: pd.Timestamp) -> pd.DataFrame:
         maturity = TypeColumn.maturity.value
         close = TypeColumn.close.value
         tables = list()
 
-        for cfg in self.download_config:
+        for cfg in self._iter_download_config():
             cache_df = self.cache[cfg.download_cfg.indicator]
             column = cfg.download_cfg.column
             serie = cache_df[self.normalize_date(as_of):self.normalize_date(as_of, hour=23, minute=45)][column]
@@ -72,9 +86,8 @@ class EsiosDownloader(BaseDownloader):
             table['area'] = cfg.commodity_cfg.area
             table['product'] = "H"  # H would be an hourly product. In the future, QH will be used
             table['offset'] = 0
-            table[maturity] = table.index
-            # Convert maturities to timestamps
-            table[maturity] = table[maturity].apply(lambda x: x.timestamp())
+            # Maturities are the dates of the index, converted to the values stored in the database
+            table[maturity] = self.maturity_values(table.index)
             table = table.rename_axis("as_of").reset_index()
             pivoted = self._pivot_table(table, value_columns=[close, maturity])
             tables.append(pivoted)
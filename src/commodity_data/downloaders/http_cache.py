@@ -0,0 +1,134 @@
+"""
+On-disk cache of http responses, used by _HttpGet.http_get.
+Responses are stored gzip compressed, in files named after a hash of the url and its params, so the same request
+always maps to the same file. There are three modes:
+    - "bypass" (default): the cache is not used at all
+    - "record": requests always go to the server, and successful responses are stored in the cache
+    - "replay": responses are read from the cache, never from the server. Requests not found in the cache raise
+    HttpCacheMissError
+Replay allows reprocessing already downloaded data (e.g. after a change in parsing) offline.
+Mode and folder can be configured in the config file, using the "http_cache" key:
+    http_cache:
+        mode: replay
+        path: ~/.cache/ongpi/http
+or changed at runtime with set_http_cache_mode
+"""
+import email.message
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from urllib3 import HTTPHeaderDict
+
+from commodity_data.globals import config, logger
+
+http_cache_modes = ("bypass", "record", "replay")
+
+
+class HttpCacheMissError(ConnectionError):
+    """A request was not found in the cache in replay mode"""
+    pass
+
+
+class CachedResponse:
+    """A response read from the cache, with the same attributes used from urllib3.HTTPResponse"""
+
+    def __init__(self, url: str, data: bytes, status: int, reason: str, headers: list):
+        self.url = url
+        self.data = data
+        self.status = status
+        self.reason = reason
+        self.headers = HTTPHeaderDict(headers)
+
+    def geturl(self) -> str:
+        return self.url
+
+    def info(self) -> email.message.Message:
+        message = email.message.Message()
+        for key, value in self.headers.iteritems():
+            message[key] = value
+        return message
+
+
+class HttpCache:
+    """Content addressed cache of http responses"""
+
+    def __init__(self, path: str | Path, mode: str = "bypass"):
+        self.path = Path(path).expanduser()
+        self.mode = mode
+
+    @property
+    def mode(self) -> str:
+        return self.__mode
+
+    @mode.setter
+    def mode(self, mode: str):
+        if mode not in http_cache_modes:
+            raise ValueError(f"Invalid http cache mode {mode}. Valid modes: {http_cache_modes}")
+        self.__mode = mode
+
+    @classmethod
+    def key(cls, url: str, params: dict = None) -> str:
+        """Returns the hash that identifies a request"""
+        request = json.dumps([url, sorted((str(k), str(v)) for k, v in (params or dict()).items())])
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def __files(self, key: str) -> tuple:
+        folder = self.path / key[:2]
+        return folder / f"{key}.gz", folder / f"{key}.json"
+
+    def get(self, url: str, params: dict = None) -> CachedResponse | None:
+        """Returns the cached response for the request, or None if the cache is not in replay mode. In replay mode,
+        raises HttpCacheMissError if the request is not found in the cache"""
+        if self.mode != "replay":
+            return None
+        data_file, meta_file = self.__files(self.key(url, params))
+        try:
+            meta = json.loads(meta_file.read_text())
+            data = gzip.decompress(data_file.read_bytes())
+        except FileNotFoundError:
+            raise HttpCacheMissError(f"Request for {url} with params {params} not found in http cache") from None
+        except (OSError, ValueError) as e:
+            raise HttpCacheMissError(f"Invalid cached response for {url} with params {params}: {e}") from None
+        return CachedResponse(url=meta['url'], data=data, status=meta['status'], reason=meta['reason'],
+                              headers=meta['headers'])
+
+    def put(self, url: str, params: dict, response):
+        """Stores a successful response in the cache (if the cache is in record mode)"""
+        if self.mode != "record" or response.status >= 399:
+            return
+        data_file, meta_file = self.__files(self.key(url, params))
+        meta = dict(url=url, params=params, status=response.status, reason=response.reason,
+                    headers=list(response.headers.items()))
+        try:
+            data_file.parent.mkdir(parents=True, exist_ok=True)
+            # Write to temporary files and then rename, so a cached response is never read half written
+            suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+            for file, content in ((data_file, gzip.compress(response.data)),
+                                  (meta_file, json.dumps(meta, default=str).encode())):
+                tmp_file = file.with_name(file.name + suffix)
+                tmp_file.write_bytes(content)
+                os.replace(tmp_file, file)
+        except OSError as e:
+            logger.warning(f"Could not store response for {url} in http cache: {e}")
+
+
+__http_cache = None
+
+
+def get_http_cache() -> HttpCache:
+    """Returns the http cache shared by all downloaders, created from the "http_cache" config key"""
+    global __http_cache
+    if __http_cache is None:
+        cfg = config("http_cache", dict()) or dict()
+        __http_cache = HttpCache(cfg.get("path", Path.home() / ".cache" / "ongpi" / "http"),
+                                 cfg.get("mode", "bypass"))
+    return __http_cache
+
+
+def set_http_cache_mode(mode: str):
+    """Changes the mode of the http cache shared by all downloaders: "bypass", "record" or "replay" """
+    get_http_cache().mode = mode
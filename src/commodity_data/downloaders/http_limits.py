@@ -0,0 +1,114 @@
+"""
+Rate limits and retries for http requests.
+Requests to the same host share a token bucket (so concurrent downloads of the same source do not exceed its rate)
+and failed requests (throttling, server errors or connection problems) are retried with jittered exponential
+backoff, honoring the Retry-After header sent by the server.
+Limits can be configured per downloader (e.g. Omip, EEX, Barchart) in the config file, using the "http_limits" key.
+Values of "default" are used for any missing downloader or value:
+    http_limits:
+        default:
+            rate: 5             # max requests per second to each host. Use null for no limit
+            burst: 5            # max requests that can be done at once after some idle time
+            max_retries: 5
+            backoff: 0.5        # seconds to wait before the first retry, then doubled on each retry
+            max_backoff: 60     # max seconds to wait between retries
+        Omip:
+            rate: 10
+            burst: 20
+"""
+import datetime
+import email.utils
+import random
+import threading
+import time
+from dataclasses import dataclass, fields
+
+from commodity_data.globals import config
+
+retry_status = (408, 425, 429, 500, 502, 503, 504)  # Status codes that are worth retrying
+
+
+@dataclass
+class HttpLimits:
+    rate: float | None = 5
+    burst: int = 5
+    max_retries: int = 5
+    backoff: float = 0.5
+    max_backoff: float = 60
+
+    @classmethod
+    def from_config(cls, name: str) -> "HttpLimits":
+        """Returns the limits configured for a downloader name in the "http_limits" config key"""
+        limits = config("http_limits", dict()) or dict()
+        values = {**(limits.get("default") or dict()), **(limits.get(name) or dict())}
+        return cls(**{f.name: values[f.name] for f in fields(cls) if f.name in values})
+
+    def backoff_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """Seconds to wait before retry number attempt (starting at 0). Uses full jitter, but never waits
+        less than retry_after"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        return max(delay, retry_after or 0)
+
+
+class TokenBucket:
+    """Thread safe token bucket: allows up to rate requests per second, with bursts of up to burst requests"""
+
+    def __init__(self, rate: float | None, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.__tokens = self.burst
+        self.__updated = time.monotonic()
+        self.__paused_until = 0.0
+        self.__lock = threading.Lock()
+
+    def __reserve(self) -> float:
+        """Takes a token, returning the seconds to wait till it is available"""
+        with self.__lock:
+            now = time.monotonic()
+            wait = max(0.0, self.__paused_until - now)
+            if self.rate:
+                self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+                self.__updated = now
+                self.__tokens -= 1
+                if self.__tokens < 0:
+                    wait = max(wait, -self.__tokens / self.rate)
+            return wait
+
+    def acquire(self):
+        """Blocks till a request can be done"""
+        if wait := self.__reserve():
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """No request will be allowed during the given seconds (e.g. after the server asked to wait)"""
+        with self.__lock:
+            self.__paused_until = max(self.__paused_until, time.monotonic() + seconds)
+
+
+__buckets = dict()
+__buckets_lock = threading.Lock()
+
+
+def get_token_bucket(host: str, limits: HttpLimits) -> TokenBucket:
+    """Returns the token bucket of a host, creating it with the given limits if it did not exist"""
+    with __buckets_lock:
+        if host not in __buckets:
+            __buckets[host] = TokenBucket(limits.rate, limits.burst)
+        return __buckets[host]
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Returns the seconds to wait from a Retry-After header (either seconds or a http date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
@@ -0,0 +1,157 @@
+"""
+Local journal of downloaded data, so an interrupted download can be resumed exactly where it stopped.
+For each market it stores the (as_of, config id) pairs that were already stored in the database and the date range
+of the last download if it did not finish.
+The journal is a json file per market with the full state, plus an append-only log (a json record per line) with
+the changes made since. Each update just appends its changes to the log, so its cost does not depend on the size of
+the journal. When the journal is read, the log is applied and compacted into the json file, replaced atomically
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from commodity_data.globals import logger
+
+
+class DownloadJournal:
+    """Journal of (as_of, config id) pairs already stored in the database for a market"""
+    journal_dir = Path.home() / ".cache" / "ongpi" / "journal"
+    date_format = "%Y-%m-%d"
+
+    def __init__(self, database: str, name: str):
+        self.file = self.journal_dir / f"{database}_{name}.json"
+        self.log_file = self.file.with_suffix(".log")
+        self.__lock = threading.Lock()
+        self.completed = dict()  # config id -> set of as_of dates formatted as str
+        self.pending_run = None  # (start, end) of an unfinished download
+        self.__unsaved = list()  # changes not appended to the log yet
+        self.__read()
+
+    def __read(self):
+        try:
+            data = json.loads(self.file.read_text())
+        except FileNotFoundError:
+            data = dict()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring invalid download journal {self.file}: {e}")
+            data = dict()
+        self.completed = {cfg_id: set(dates) for cfg_id, dates in data.get("completed", dict()).items()}
+        if pending := data.get("pending_run"):
+            self.pending_run = tuple(pd.Timestamp(d) for d in pending)
+        try:
+            lines = self.log_file.read_text().splitlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Ignoring invalid download journal log {self.log_file}: {e}")
+            return
+        for line in lines:
+            try:
+                self.__apply(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                # The last line might be incomplete if the process died while writing it
+                logger.warning(f"Ignoring invalid record of download journal log {self.log_file}: {line}")
+        self.__compact()
+
+    def __apply(self, record: dict):
+        """Applies a record of the log to the journal in memory"""
+        if "add" in record:
+            for cfg_id, keys in record["add"].items():
+                self.completed.setdefault(cfg_id, set()).update(keys)
+        if "remove" in record:
+            start, end = record["remove"]
+            for dates in self.completed.values():
+                dates.difference_update([d for d in dates if start <= d <= end])
+        if "pending_run" in record:
+            pending = record["pending_run"]
+            self.pending_run = tuple(pd.Timestamp(d) for d in pending) if pending else None
+
+    def __compact(self):
+        """Writes the full journal to disk, replacing the previous file atomically, and empties the log"""
+        with self.__lock:
+            data = dict(completed={cfg_id: sorted(dates) for cfg_id, dates in self.completed.items()},
+                        pending_run=[d.isoformat() for d in self.pending_run] if self.pending_run else None)
+            self.__unsaved = list()
+            try:
+                self.file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = self.file.with_suffix(f".{os.getpid()}.tmp")
+                tmp_file.write_text(json.dumps(data))
+                os.replace(tmp_file, self.file)
+                self.log_file.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not save download journal {self.file}: {e}")
+
+    def __record(self, record: dict, save: bool):
+        """Records a change (already applied in memory), appending it to the log if save"""
+        with self.__lock:
+            self.__unsaved.append(record)
+        if save:
+            self.save()
+
+    def save(self):
+        """Appends the changes not saved yet to the log"""
+        with self.__lock:
+            if not self.__unsaved:
+                return
+            lines = "".join(json.dumps(record) + "\n" for record in self.__unsaved)
+            self.__unsaved = list()
+            try:
+                self.log_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.log_file, "a") as f:
+                    f.write(lines)
+            except OSError as e:
+                logger.warning(f"Could not save download journal {self.log_file}: {e}")
+
+    def __key(self, as_of: pd.Timestamp) -> str:
+        return as_of.strftime(self.date_format)
+
+    def is_complete(self, as_of: pd.Timestamp, cfg_ids: list) -> bool:
+        """True if as_of was stored for all the given config ids"""
+        key = self.__key(as_of)
+        return all(key in self.completed.get(cfg_id, ()) for cfg_id in cfg_ids)
+
+    def in_pending_run(self, as_of: pd.Timestamp) -> bool:
+        """True if as_of belongs to the date range of a download that did not finish"""
+        if not self.pending_run:
+            return False
+        start, end = self.pending_run
+        return start <= as_of <= end
+
+    def add(self, as_of_dates, cfg_ids: list, save: bool = True):
+        """Marks the given dates as stored for the given config ids"""
+        keys = sorted(set(self.__key(as_of) for as_of in as_of_dates))
+        with self.__lock:
+            for cfg_id in cfg_ids:
+                self.completed.setdefault(cfg_id, set()).update(keys)
+        self.__record(dict(add={cfg_id: keys for cfg_id in cfg_ids}), save)
+
+    def remove(self, start_date: pd.Timestamp, end_date: pd.Timestamp, save: bool = True):
+        """Removes all the dates between start_date and end_date (both included)"""
+        record = dict(remove=[self.__key(start_date), self.__key(end_date)])
+        with self.__lock:
+            self.__apply(record)
+        self.__record(record, save)
+
+    def start_run(self, start_date: pd.Timestamp, end_date: pd.Timestamp):
+        """Records that a download for the given dates started. If there was an unfinished download, the new
+        date range includes the old one"""
+        if self.pending_run:
+            start_date = min(start_date, self.pending_run[0])
+            end_date = max(end_date, self.pending_run[1])
+        self.pending_run = (start_date, end_date)
+        self.__record(dict(pending_run=[d.isoformat() for d in self.pending_run]), True)
+
+    def finish_run(self):
+        """Records that the download finished"""
+        self.pending_run = None
+        self.__record(dict(pending_run=None), True)
+
+    def clear(self):
+        """Removes everything from the journal"""
+        with self.__lock:
+            self.completed = dict()
+            self.pending_run = None
+        self.__compact()
@@ -0,0 +1,75 @@
+"""
+Conversions between the wide layout of settlement_df (as_of dates as rows, a column for each combination of the
+levels of df_index_columns) and a long layout, with a row for each available value and columns:
+    - as_of: the date of the value
+    - series_id: the values of all levels but "type", joined by "|" (e.g. "Omip|Power|BL|ES|Y|1")
+    - type: the value of the "type" level (close, adj_close, maturity)
+    - value: the value (as float)
+The wide layout is mostly empty (each product and offset has a column for all dates), so the long layout needs
+space proportional to the actual values.
+"""
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.series_config import df_index_columns
+
+long_columns = ["as_of", "series_id", "type", "value"]
+series_levels = [level for level in df_index_columns if level != "type"]
+series_id_separator = "|"
+storage_layouts = ("wide", "long")
+
+
+def series_ids(columns: pd.MultiIndex) -> np.ndarray:
+    """Returns the series_id of each column of a settlement_df like MultiIndex"""
+    levels = [columns.get_level_values(level).astype(str) for level in series_levels]
+    retval = levels[0]
+    for level in levels[1:]:
+        retval = retval + series_id_separator + level
+    return np.asarray(retval)
+
+
+def columns_from_ids(ids, types) -> pd.MultiIndex:
+    """Returns the settlement_df like MultiIndex columns for the given series_ids and types"""
+    unique_ids, inverse = np.unique(np.asarray(ids, dtype=str), return_inverse=True)
+    split = pd.Series(unique_ids).str.split(series_id_separator, expand=True, regex=False)
+    split.columns = series_levels
+    split['offset'] = split['offset'].astype(int)
+    arrays = [split[level].to_numpy()[inverse] for level in series_levels]
+    return pd.MultiIndex.from_arrays([*arrays, np.asarray(types)], names=df_index_columns)
+
+
+def wide_to_long(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts a settlement_df like DataFrame with numeric values (maturities as timestamps) to the long layout.
+    Missing values are not included. Rows are sorted by series, type and as_of
+    """
+    if df.empty:
+        return pd.DataFrame({"as_of": pd.DatetimeIndex([], tz=df.index.tz), "series_id": pd.Series([], dtype=str),
+                             "type": pd.Series([], dtype=str), "value": pd.Series([], dtype=np.float64)})
+    values = df.to_numpy(dtype=np.float64)
+    # Traverse by columns, so values of the same series are together
+    cols, rows = np.nonzero(~np.isnan(values.T))
+    ids = series_ids(df.columns)
+    types = np.asarray(df.columns.get_level_values("type").astype(str))
+    return pd.DataFrame({"as_of": df.index[rows],
+                         "series_id": pd.Categorical(ids[cols]),
+                         "type": pd.Categorical(types[cols]),
+                         "value": values[rows, cols]})
+
+
+def long_to_wide(long_df: pd.DataFrame) -> pd.DataFrame:
+    """Converts a DataFrame in long layout to a settlement_df like DataFrame (sorted by rows and columns)"""
+    if long_df.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex(long_df['as_of'] if 'as_of' in long_df else [], name="as_of"),
+                            columns=pd.MultiIndex.from_arrays([[]] * len(df_index_columns), names=df_index_columns),
+                            dtype=np.float64)
+    row_codes, index = pd.factorize(long_df['as_of'], sort=True)
+    # Columns are identified by the codes of series_id and type, so no strings are created for each value
+    id_codes, ids = pd.factorize(long_df['series_id'])
+    type_codes, types = pd.factorize(long_df['type'])
+    col_codes, keys = pd.factorize(id_codes * len(types) + type_codes)
+    values = np.full((len(index), len(keys)), np.nan)
+    values[row_codes, col_codes] = long_df['value'].to_numpy(dtype=np.float64)
+    columns = columns_from_ids(np.asarray(ids)[keys // len(types)], np.asarray(types)[keys % len(types)])
+    retval = pd.DataFrame(values, index=pd.DatetimeIndex(index, name="as_of"), columns=columns)
+    return retval.sort_index(axis=1)
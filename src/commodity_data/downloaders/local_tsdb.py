@@ -0,0 +1,199 @@
+"""
+Local, file based replacement of OngTsdbClient, so data can be downloaded, rolled and loaded without an ong_tsdb
+server (e.g. offline, for benchmarks or as a local replica).
+Each database is a sqlite file and each sensor a table in long layout (see layout.py), with a row per
+(as_of, series_id, type) that has a value. It implements the subset of the OngTsdbClient interface used by
+BaseDownloader, with the same semantics: write_df writes every cell of the DataFrame, so NaN values delete
+stored values.
+It is used by the "local" storage backend (see storage.py). Files are stored in ~/.cache/ongpi/tsdb unless
+"local_tsdb_path" is configured
+"""
+import contextlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.layout import wide_to_long, long_to_wide, series_ids, columns_from_ids
+from commodity_data.globals import config
+
+
+class LocalTsdbClient:
+    """Drop-in replacement of OngTsdbClient that stores data in local sqlite files"""
+    default_path = Path.home() / ".cache" / "ongpi" / "tsdb"
+    daily_period = "1D"  # Sensors with this period store dates without time zone, as ong_tsdb does
+
+    def __init__(self, path: str | Path = None):
+        self.path = Path(path or config("local_tsdb_path", None) or self.default_path).expanduser()
+        self.__lock = threading.Lock()  # sqlite allows a single writer
+
+    def update_token(self, token: str):
+        """Tokens are not needed for local files"""
+        pass
+
+    def config_reload(self):
+        pass
+
+    def __file(self, db: str) -> Path:
+        return self.path / f"{db}.sqlite"
+
+    @contextlib.contextmanager
+    def __connect(self, db: str):
+        """Yields a connection to the file of the database, committing changes (or rolling them back on errors)"""
+        con = sqlite3.connect(self.__file(db), timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def __table(sensor: str) -> str:
+        return '"data_' + sensor.replace('"', '""') + '"'
+
+    def __sensor_info(self, db: str, sensor: str) -> tuple | None:
+        """Returns (period, level_names) of a sensor, or None if it does not exist"""
+        if not self.exist_db(db):
+            return None
+        with self.__connect(db) as con:
+            return con.execute("SELECT period, level_names FROM sensors WHERE name = ?", (sensor,)).fetchone()
+
+    def exist_db(self, db: str) -> bool:
+        return self.__file(db).exists()
+
+    def create_db(self, db: str) -> bool:
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self.__lock, self.__connect(db) as con:
+            con.execute("CREATE TABLE IF NOT EXISTS sensors (name TEXT PRIMARY KEY, period TEXT, level_names TEXT)")
+        return True
+
+    def exist_sensor(self, db: str, sensor: str) -> bool:
+        return self.__sensor_info(db, sensor) is not None
+
+    def create_sensor(self, db: str, sensor: str, period: str, metrics: list, read_token: str = None,
+                      write_token: str = None, level_names: list = None) -> bool:
+        with self.__lock, self.__connect(db) as con:
+            con.execute(f"CREATE TABLE IF NOT EXISTS {self.__table(sensor)} (as_of INTEGER, series_id TEXT, "
+                        f"type TEXT, value REAL, PRIMARY KEY (as_of, series_id, type)) WITHOUT ROWID")
+            con.execute("INSERT OR REPLACE INTO sensors VALUES (?, ?, ?)",
+                        (sensor, period, json.dumps(level_names) if level_names else None))
+        return True
+
+    def delete_sensor(self, db: str, sensor: str) -> bool:
+        if not self.exist_sensor(db, sensor):
+            return False
+        with self.__lock, self.__connect(db) as con:
+            con.execute(f"DROP TABLE IF EXISTS {self.__table(sensor)}")
+            con.execute("DELETE FROM sensors WHERE name = ?", (sensor,))
+        return True
+
+    def get_metadata(self, db: str, sensor: str) -> list | None:
+        info = self.__sensor_info(db, sensor)
+        return json.loads(info[1]) if info and info[1] else None
+
+    def set_level_names(self, db: str, sensor: str, level_names: list):
+        with self.__lock, self.__connect(db) as con:
+            con.execute("UPDATE sensors SET level_names = ? WHERE name = ?", (json.dumps(level_names), sensor))
+
+    def __is_daily(self, db: str, sensor: str) -> bool:
+        info = self.__sensor_info(db, sensor)
+        return info is not None and info[0] == self.daily_period
+
+    @staticmethod
+    def __to_seconds(index: pd.DatetimeIndex) -> np.ndarray:
+        """Dates as seconds since epoch. Dates with time zone are stored in utc, naive dates as they are"""
+        if index.tz is not None:
+            index = index.tz_convert("UTC").tz_localize(None)
+        return index.as_unit("s").asi8
+
+    def __from_seconds(self, seconds, daily: bool) -> pd.DatetimeIndex:
+        index = pd.to_datetime(np.asarray(seconds, dtype=np.int64), unit="s")
+        return pd.DatetimeIndex(index) if daily else pd.DatetimeIndex(index).tz_localize("UTC")
+
+    def __seconds(self, date, daily: bool) -> int:
+        date = pd.Timestamp(date)
+        if daily and date.tz is not None:
+            # Daily data is stored with local dates
+            date = date.tz_localize(None)
+        return int(self.__to_seconds(pd.DatetimeIndex([date]))[0])
+
+    def write_df(self, db: str, sensor: str, df: pd.DataFrame, fill_value=np.nan) -> bool:
+        """Writes all the values of df (including missing values, that delete stored values). Returns True if ok"""
+        if df.empty:
+            return True
+        if not self.exist_sensor(db, sensor):
+            return False
+        if not np.isnan(fill_value):
+            df = df.fillna(fill_value)
+        as_of = self.__to_seconds(df.index)
+        long_df = wide_to_long(df)
+        rows = zip(self.__to_seconds(pd.DatetimeIndex(long_df['as_of'])).tolist(),
+                   long_df['series_id'].astype(str).tolist(),
+                   long_df['type'].astype(str).tolist(), long_df['value'].tolist())
+        cells = zip(series_ids(df.columns).tolist(), df.columns.get_level_values("type").astype(str).tolist())
+        with self.__lock, self.__connect(db) as con:
+            con.execute("CREATE TEMP TABLE written_dates (as_of INTEGER PRIMARY KEY)")
+            con.executemany("INSERT OR IGNORE INTO written_dates VALUES (?)", ((int(v),) for v in as_of))
+            # Delete all the cells of the DataFrame, so missing values are deleted, then insert values
+            con.executemany(f"DELETE FROM {self.__table(sensor)} WHERE series_id = ? AND type = ? "
+                            f"AND as_of IN (SELECT as_of FROM written_dates)", cells)
+            con.executemany(f"INSERT INTO {self.__table(sensor)} VALUES (?, ?, ?, ?)", rows)
+            con.execute("DROP TABLE written_dates")
+        return True
+
+    def read(self, db: str, sensor: str, date_from=None, date_to=None, columns: pd.MultiIndex = None) -> pd.DataFrame:
+        """Reads data between date_from and date_to (both included and optional). Index is naive for daily sensors
+        and in UTC for the rest. If columns is given, just those columns are read (if they have data)"""
+        daily = self.__is_daily(db, sensor)
+        where, params = list(), list()
+        if date_from is not None:
+            where.append("as_of >= ?")
+            params.append(self.__seconds(date_from, daily))
+        if date_to is not None:
+            where.append("as_of <= ?")
+            params.append(self.__seconds(date_to, daily))
+        if columns is not None:
+            # Series are filtered with a temp table, as there can be more than the limit of parameters of a query
+            where.append("series_id IN (SELECT series_id FROM read_series)")
+        query = f"SELECT as_of, series_id, type, value FROM {self.__table(sensor)}"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        with self.__connect(db) as con:
+            if columns is not None:
+                con.execute("CREATE TEMP TABLE read_series (series_id TEXT PRIMARY KEY)")
+                con.executemany("INSERT OR IGNORE INTO read_series VALUES (?)",
+                                ((series_id,) for series_id in set(series_ids(columns).tolist())))
+            long_df = pd.read_sql_query(query, con, params=params)
+        long_df['as_of'] = self.__from_seconds(long_df['as_of'], daily)
+        if columns is not None:
+            # Filter just the requested types of each series
+            requested = pd.MultiIndex.from_arrays([series_ids(columns), columns.get_level_values("type")])
+            long_df = long_df[pd.MultiIndex.from_arrays([long_df['series_id'], long_df['type']]).isin(requested)]
+        return long_to_wide(long_df)
+
+    def read_columns(self, db: str, sensor: str) -> pd.MultiIndex:
+        """Returns the columns that have data, without reading their values"""
+        with self.__connect(db) as con:
+            cells = con.execute(f"SELECT DISTINCT series_id, type FROM {self.__table(sensor)}").fetchall()
+        return columns_from_ids([c[0] for c in cells], [c[1] for c in cells]).sort_values()
+
+    def read_dates(self, db: str, sensor: str, date_from=None) -> pd.DatetimeIndex:
+        """Returns the dates (since date_from, if given) that have data, without reading their values"""
+        daily = self.__is_daily(db, sensor)
+        query = f"SELECT DISTINCT as_of FROM {self.__table(sensor)}"
+        params = list()
+        if date_from is not None:
+            query += " WHERE as_of >= ?"
+            params.append(self.__seconds(date_from, daily))
+        with self.__connect(db) as con:
+            dates = [row[0] for row in con.execute(query + " ORDER BY as_of", params)]
+        return self.__from_seconds(dates, daily).rename("as_of")
+
+    def get_lastdate(self, db: str, sensor: str) -> pd.Timestamp | None:
+        daily = self.__is_daily(db, sensor)
+        with self.__connect(db) as con:
+            last = con.execute(f"SELECT MAX(as_of) FROM {self.__table(sensor)}").fetchone()[0]
+        return None if last is None else self.__from_seconds([last], daily)[0]
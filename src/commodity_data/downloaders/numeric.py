@@ -0,0 +1,70 @@
+"""
+Conversion of float32 values (as stored in the database) to float64 without binary artifacts.
+A float32 such as 12.3 is read as 12.300000190734863 if just converted with astype(np.float64). Converting with
+astype(str).astype(np.float64) gives 12.3, as str returns the shortest decimal that converts back to the same
+float32, but it creates a python str for every value.
+widen_float32 gets the same values working on numpy arrays: each value is rounded to 1, 2, ... 9 significant digits
+and the first rounding that converts back to the same float32 is kept
+"""
+import numpy as np
+import pandas as pd
+
+float32_max_digits = 9  # Max significant digits needed to represent any float32
+
+
+def _round_significant(values: np.ndarray, digits: int, exponents: np.ndarray) -> np.ndarray:
+    """Rounds float64 values to the given significant digits, being exponents floor(log10(abs(values))).
+    The result is the nearest float64 to the rounded decimal number, as integers and powers of 10 up to 1e22
+    are exact in float64 and a single division (or multiplication) is correctly rounded. Rounding to digits must
+    not need powers of 10 beyond 1e22"""
+    shift = digits - 1 - exponents
+    retval = np.empty_like(values)
+    positive = shift >= 0
+    scale = 10.0 ** shift[positive]
+    retval[positive] = np.round(values[positive] * scale) / scale
+    scale = 10.0 ** -shift[~positive]
+    retval[~positive] = np.round(values[~positive] / scale) * scale
+    return retval
+
+
+def widen_float32(values: np.ndarray) -> np.ndarray:
+    """
+    Converts an array of float32 to float64, choosing for each value the float64 nearest to the shortest decimal
+    representation of the float32 (the same as values.astype(str).astype(np.float64), but vectorized)
+    :param values: a numpy array of float32 (of any shape)
+    :return: a numpy array of float64 with the same shape
+    """
+    values = np.asarray(values, dtype=np.float32)
+    # C order, so flat is a view of retval (for other orders, such as arrays of DataFrames, reshape copies)
+    retval = values.astype(np.float64, order="C")
+    flat = retval.reshape(-1)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # Zero, nan and inf are already exact
+        pending = np.flatnonzero(np.isfinite(flat) & (flat != 0))
+        exponents = np.floor(np.log10(np.abs(flat[pending])))
+        # Powers of 10 beyond 1e22 are not exact: convert those (very unusual) values through str
+        extreme = (exponents > 22) | (exponents < float32_max_digits - 1 - 22)
+        if extreme.any():
+            flat[pending[extreme]] = flat[pending[extreme]].astype(np.float32).astype(str).astype(np.float64)
+            pending, exponents = pending[~extreme], exponents[~extreme]
+        for digits in range(1, float32_max_digits + 1):
+            if not len(pending):
+                break
+            candidates = _round_significant(flat[pending], digits, exponents)
+            found = candidates.astype(np.float32) == flat[pending].astype(np.float32)
+            flat[pending[found]] = candidates[found]
+            pending = pending[~found]
+            exponents = exponents[~found]
+    return retval
+
+
+def widen_float32_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns df with its float32 columns converted to float64 with widen_float32. Other columns are unchanged"""
+    columns_float32 = (df.dtypes == np.float32).to_numpy()
+    if df.empty or not columns_float32.any():
+        return df
+    if columns_float32.all():
+        return pd.DataFrame(widen_float32(df.to_numpy()), index=df.index, columns=df.columns)
+    retval = df.astype({col: np.float64 for col in df.columns[columns_float32]})
+    retval.iloc[:, np.flatnonzero(columns_float32)] = widen_float32(df.iloc[:, columns_float32].to_numpy())
+    return retval
@@ -44,6 +44,7 @@ def parse_omip_product_maturity_offset(omip_product: str, as_of: pd.Timestamp) -
 
 class OmipData(_HttpGet):
     logger = logger
+    http_limits_name = "Omip"
     """Class to download data directly from omip website"""
 
     def download_omip_data(self, as_of: str, instrument="FTB", product="EL", zone="ES", **kwargs) -> (
@@ -40,7 +40,7 @@ class OmipDownloader(BaseDownloader):
                     df[c] = getattr(cfg.commodity_cfg, c)
             df['market'] = self.name()
             df['type'] = TypeColumn.close.value
-            df['maturity'] = df['maturity'].apply(lambda x: x.timestamp())
+            df['maturity'] = self.maturity_values(df['maturity'])
             df = self._pivot_table(df, value_columns=['close', 'maturity'])
             dfs.append(df)
         if dfs:
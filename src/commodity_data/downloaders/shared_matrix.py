@@ -0,0 +1,126 @@
+"""
+Settlement data shared between processes of the same host through memory-mapped files.
+A process publishes the settlement_df of a market (e.g. after loading or downloading it) and other processes attach
+to it, getting a read-only DataFrame whose columns are views of the mapped files, so data is not copied and memory
+is paid once per host (the page cache is shared by all processes) instead of once per process.
+For each market, published data is stored as:
+    - a matrix of float64 values, with a row per column of settlement_df (so each column is contiguous)
+    - a matrix of int64 values (nanoseconds since epoch) for the datetime columns (maturities)
+    - the index (nanoseconds since epoch)
+    - a json catalog with the columns, their kind and the version of the files
+Files are stored in /dev/shm/ongpi (or in ~/.cache/ongpi/shared if /dev/shm is not available) unless
+"shared_matrix_path" is configured. Publishing writes new files and replaces the catalog atomically, so processes
+already attached keep their data till they attach again
+"""
+import json
+import os
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.series_config import df_index_columns
+from commodity_data.globals import logger, config
+
+
+class SharedSettlementMatrix:
+    """Publishes and attaches to the settlement data of a market in memory-mapped files"""
+    shared_dir = Path("/dev/shm/ongpi") if Path("/dev/shm").is_dir() else Path.home() / ".cache" / "ongpi" / "shared"
+    float_kind = "float"
+
+    def __init__(self, database: str, name: str):
+        self.path = Path(config("shared_matrix_path", None) or self.shared_dir).expanduser()
+        self.prefix = f"{database}_{name}"
+        self.catalog_file = self.path / f"{self.prefix}.json"
+
+    def __file(self, version: str, what: str) -> Path:
+        return self.path / f"{self.prefix}.{version}.{what}.npy"
+
+    def __save(self, file: Path, values: np.ndarray):
+        tmp_file = file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "wb") as f:
+            np.save(f, values)
+        os.replace(tmp_file, file)
+
+    def __read_catalog(self) -> dict | None:
+        try:
+            return json.loads(self.catalog_file.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring invalid shared matrix catalog {self.catalog_file}: {e}")
+            return None
+
+    def publish(self, df: pd.DataFrame):
+        """Publishes df (a settlement_df like DataFrame, with a DatetimeIndex) so other processes can attach to it.
+        Datetime columns (with or without time zone) are shared as such, the rest of columns as float64"""
+        kinds = [str(dtype.tz) if isinstance(dtype, pd.DatetimeTZDtype) else
+                 ("" if pd.api.types.is_datetime64_dtype(dtype) else self.float_kind) for dtype in df.dtypes]
+        is_float = np.array([kind == self.float_kind for kind in kinds], dtype=bool)
+        floats = np.ascontiguousarray(df.loc[:, is_float].to_numpy(dtype=np.float64, na_value=np.nan).T)
+        dates = np.empty((int((~is_float).sum()), len(df)), dtype=np.int64)
+        for row, col in enumerate(np.flatnonzero(~is_float)):
+            dates[row] = pd.DatetimeIndex(df.iloc[:, col]).as_unit("ns").asi8
+        previous = self.__read_catalog()
+        version = uuid.uuid4().hex
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.__save(self.__file(version, "floats"), floats)
+        self.__save(self.__file(version, "dates"), dates)
+        self.__save(self.__file(version, "index"), pd.DatetimeIndex(df.index).as_unit("ns").asi8)
+        catalog = dict(version=version, index_name=df.index.name,
+                       index_tz=str(df.index.tz) if df.index.tz else None,
+                       columns=[[v.item() if hasattr(v, "item") else v for v in col] for col in df.columns],
+                       column_names=list(df.columns.names), kinds=kinds)
+        tmp_file = self.catalog_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp_file.write_text(json.dumps(catalog))
+        os.replace(tmp_file, self.catalog_file)
+        if previous:
+            self.__remove(previous['version'])
+        logger.debug(f"Published {df.shape} shared matrix of {self.prefix}")
+
+    def attach(self) -> pd.DataFrame | None:
+        """Returns a read-only DataFrame mapped to the published data, or None if nothing was published"""
+        if (catalog := self.__read_catalog()) is None:
+            return None
+        version = catalog['version']
+        try:
+            floats = np.load(self.__file(version, "floats"), mmap_mode="r")
+            dates = np.load(self.__file(version, "dates"), mmap_mode="r")
+            index = np.load(self.__file(version, "index"))
+        except (OSError, ValueError) as e:
+            # Files might have been replaced by a new version while reading the catalog
+            logger.warning(f"Could not attach to shared matrix {self.prefix}: {e}")
+            return None
+        index = pd.DatetimeIndex(index.view("M8[ns]"), name=catalog.get('index_name'))
+        if catalog['index_tz']:
+            index = index.tz_localize("UTC").tz_convert(catalog['index_tz'])
+        columns = pd.MultiIndex.from_tuples([tuple(col) for col in catalog['columns']],
+                                            names=catalog.get('column_names', df_index_columns))
+        data = dict()
+        float_row = date_row = 0
+        for column, kind in zip(columns, catalog['kinds']):
+            if kind == self.float_kind:
+                data[column] = floats[float_row]
+                float_row += 1
+            else:
+                values = pd.array(dates[date_row].view("M8[ns]"), copy=False)
+                data[column] = values.view(pd.DatetimeTZDtype(tz=kind)) if kind else values
+                date_row += 1
+        # copy=False keeps each column as a view of the mapped files
+        retval = pd.DataFrame(data, index=index, columns=columns, copy=False)
+        return retval
+
+    def __remove(self, version: str):
+        for what in ("floats", "dates", "index"):
+            try:
+                self.__file(version, what).unlink(missing_ok=True)
+            except OSError as e:
+                # Files still mapped by other processes cannot be removed in some platforms
+                logger.debug(f"Could not remove shared matrix file: {e}")
+
+    def clear(self):
+        """Removes the published data"""
+        if catalog := self.__read_catalog():
+            self.__remove(catalog['version'])
+        self.catalog_file.unlink(missing_ok=True)
@@ -0,0 +1,154 @@
+"""
+Local snapshot of the data stored in the database, so load() does not need to read the full history from the server.
+For each market, data is stored in a parquet file together with a tag (a json file) with the date up to which the
+snapshot is in sync with the server. load() reads the snapshot and just the data newer than the tag from the server.
+Any write to the database invalidates the snapshot from the first written date, moving the tag back.
+Data can be stored in the wide layout of settlement_df or in the long layout (see layout.py), that needs less
+space for sparse data, setting "storage_layout: long" in the config file. It applies just to snapshots, the layout of
+the database depends on the storage backend (see storage.py).
+Needs pyarrow. Snapshots can be disabled setting "local_snapshot: false" in the config file
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from commodity_data.downloaders.layout import storage_layouts, wide_to_long, long_to_wide, series_ids, \
+    columns_from_ids
+from commodity_data.downloaders.series_config import df_index_columns
+from commodity_data.globals import logger, config
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class SettlementSnapshot:
+    """Parquet snapshot of the data of a market, tagged with the date up to which it is synced with the server"""
+    snapshot_dir = Path.home() / ".cache" / "ongpi" / "snapshots"
+
+    def __init__(self, database: str, name: str):
+        self.file = self.snapshot_dir / f"{database}_{name}.parquet"
+        self.tag_file = self.file.with_suffix(".json")
+        self.__lock = threading.Lock()
+        self.enabled = pyarrow is not None and config("local_snapshot", True)
+        self.layout = config("storage_layout", "wide")
+        if self.layout not in storage_layouts:
+            raise ValueError(f"Invalid storage_layout {self.layout}. Valid values: {storage_layouts}")
+
+    def __read_tag(self) -> dict:
+        try:
+            return json.loads(self.tag_file.read_text())
+        except (OSError, ValueError):
+            return dict()
+
+    @property
+    def synced_to(self) -> pd.Timestamp | None:
+        """Date up to which (excluded) the snapshot has the same data as the server, or None if not valid"""
+        synced_to = self.__read_tag().get("synced_to")
+        return pd.Timestamp(synced_to) if synced_to else None
+
+    @property
+    def stored_layout(self) -> str:
+        """Layout of the stored snapshot (that might be different from self.layout if config changed)"""
+        return self.__read_tag().get("layout", "wide")
+
+    def __write_tag(self, synced_to: pd.Timestamp | None, layout: str = None):
+        tmp_file = self.tag_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp_file.write_text(json.dumps(dict(synced_to=synced_to.isoformat() if synced_to is not None else None,
+                                            layout=layout or self.stored_layout)))
+        os.replace(tmp_file, self.tag_file)
+
+    @staticmethod
+    def __column_name(column: tuple) -> str:
+        """Parquet needs str column names, so column tuples are stored as json"""
+        return json.dumps([v.item() if hasattr(v, "item") else v for v in column])
+
+    def columns(self) -> pd.MultiIndex | None:
+        """Returns the columns of the snapshot without reading its data, or None if there is no valid snapshot"""
+        if not self.enabled or self.synced_to is None:
+            return None
+        try:
+            if self.stored_layout == "long":
+                series = pd.read_parquet(self.file, columns=["series_id", "type"]).drop_duplicates()
+                return columns_from_ids(series['series_id'], series['type']).sort_values()
+            names = pyarrow.parquet.read_schema(self.file).names
+        except Exception as e:
+            logger.warning(f"Ignoring invalid snapshot {self.file}: {e}")
+            return None
+        return pd.MultiIndex.from_tuples([tuple(json.loads(c)) for c in names if c.startswith("[")],
+                                         names=df_index_columns)
+
+    def read(self, columns: list = None) -> tuple:
+        """Returns a tuple of the snapshot data (rows before the synced date) and the synced date,
+        or (None, None) if there is no valid snapshot. If columns is given, just those columns are read"""
+        if not self.enabled or (synced_to := self.synced_to) is None:
+            return None, None
+        try:
+            if self.stored_layout == "long":
+                df = self.__read_long(columns)
+            else:
+                df = pd.read_parquet(self.file, columns=None if columns is None else
+                                     [self.__column_name(c) for c in columns])
+                df.columns = pd.MultiIndex.from_tuples([tuple(json.loads(c)) for c in df.columns],
+                                                       names=df_index_columns)
+        except Exception as e:
+            logger.warning(f"Ignoring invalid snapshot {self.file}: {e}")
+            return None, None
+        return df[df.index < synced_to], synced_to
+
+    def __read_long(self, columns: list = None) -> pd.DataFrame:
+        """Reads a snapshot stored in long layout, returning it in wide layout"""
+        if columns is None:
+            return long_to_wide(pd.read_parquet(self.file))
+        columns = pd.MultiIndex.from_tuples(columns, names=df_index_columns)
+        ids = series_ids(columns)
+        df = pd.read_parquet(self.file, filters=[("series_id", "in", list(set(ids)))])
+        # Filter just the requested types of each series
+        requested = pd.MultiIndex.from_arrays([ids, columns.get_level_values("type")])
+        df = df[pd.MultiIndex.from_arrays([df['series_id'].astype(str), df['type'].astype(str)]).isin(requested)]
+        return long_to_wide(df).reindex(columns=columns)
+
+    def write(self, df: pd.DataFrame, synced_to: pd.Timestamp):
+        """Stores df in the snapshot, marking it as in sync with the server for dates before synced_to"""
+        if not self.enabled:
+            return
+        with self.__lock:
+            try:
+                self.file.parent.mkdir(parents=True, exist_ok=True)
+                # Invalidate first, so the snapshot is never used if the process dies while writing
+                self.__write_tag(None)
+                if self.layout == "long":
+                    data = wide_to_long(df)
+                else:
+                    data = df.set_axis([self.__column_name(c) for c in df.columns], axis=1)
+                tmp_file = self.file.with_suffix(f".{os.getpid()}.tmp")
+                data.to_parquet(tmp_file)
+                os.replace(tmp_file, self.file)
+                self.__write_tag(synced_to, self.layout)
+            except Exception as e:
+                logger.warning(f"Could not write snapshot {self.file}: {e}")
+
+    def invalidate(self, from_date: pd.Timestamp):
+        """Marks the snapshot as not synced with the server from the given date"""
+        with self.__lock:
+            synced_to = self.synced_to
+            if synced_to is None or from_date >= synced_to:
+                return
+            try:
+                self.__write_tag(from_date)
+            except OSError as e:
+                logger.warning(f"Could not update snapshot {self.tag_file}: {e}")
+                self.clear()
+
+    def clear(self):
+        """Removes the snapshot"""
+        for file in (self.tag_file, self.file):
+            try:
+                file.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not remove snapshot {file}: {e}")
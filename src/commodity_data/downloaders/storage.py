@@ -0,0 +1,268 @@
+"""
+Storage backends for the settlement data of the downloaders.
+A backend stores the data of a market (a sensor of a database) and reads and writes DataFrames as in
+settlement_df: columns with the levels of df_index_columns, index in local time zone and float64 values (maturities
+as timestamps). Reads accept a date range and a column projection, so backends that can filter data when reading
+(such as the local one) read just the requested data.
+Backends available:
+    - "ong_tsdb" (default): an ong_tsdb server, using the url, tokens and proxy configuration of the config file
+    - "local": local sqlite files (see local_tsdb.py)
+The backend is selected with "storage_backend" in the config file. Other backends can be added with
+register_storage_backend
+"""
+import abc
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyotp
+
+import ong_tsdb.exceptions
+from commodity_data.downloaders.local_tsdb import LocalTsdbClient
+from commodity_data.downloaders.numeric import widen_float32_columns
+from commodity_data.downloaders.series_config import df_index_columns
+from commodity_data.globals import config, logger, get_password
+from ong_tsdb.client import OngTsdbClient
+
+
+class _GoogleAuth(pyotp.TOTP):
+    last_otp = ""
+
+    def now(self) -> str:
+        """Returns a TOTP code, preventing reuse (waits for a new one if needed)"""
+        otp = super().now()
+        if otp == _GoogleAuth.last_otp:
+            logger.info("Waiting for new MFA code...")
+            while super().now() == _GoogleAuth.last_otp:
+                time.sleep(1)
+            logger.info("New MFA code generated")
+        otp = super().now()
+        _GoogleAuth.last_otp = otp
+        return otp
+
+
+class _OngTsdbClientManager:
+    """Creates the clients of the ong_tsdb server, shared by all markets. There is a client per token (admin and
+    write), so a client never changes its token while another thread is using it"""
+    __clients = dict()  # config key of the token -> OngTsdbClient
+    __otp = None
+    __server_url = config("url")
+    __lock = threading.Lock()  # Downloaders of different markets might create the clients at the same time
+    logger = logger
+
+    def __init__(self, name: str, ):
+        self.name = name
+
+    @classmethod
+    def proxy_auth_dict(cls, name: str) -> dict | None:
+        """Returns proxy auth dict, including MFA Code"""
+        if config("service_name_google_auth", None) is not None and cls.__otp is None:
+            cls.__otp = _GoogleAuth(get_password("service_name_google_auth", "proxy_username"))
+        if cls.__otp is None:
+            return None
+        cls.logger.info(f"Getting MFA code for {name}")
+        mfa_code = cls.__otp.now()
+        proxy_auth_dict = dict(username=config("proxy_username"),
+                               password=get_password("service_name_proxy", "proxy_username"),
+                               mfa_code=mfa_code)
+        return proxy_auth_dict
+
+    @classmethod
+    def __get_client(cls, name: str, token_key: str) -> OngTsdbClient:
+        with cls.__lock:
+            if token_key not in cls.__clients:
+                cls.__clients[token_key] = OngTsdbClient(cls.__server_url, config(token_key), retry_connect=1,
+                                                         retry_total=1, proxy_auth_body=cls.proxy_auth_dict(name),
+                                                         validate_server_version=config("validate_server_version",
+                                                                                        True))
+            return cls.__clients[token_key]
+
+    def __client(self, token_key: str) -> OngTsdbClient:
+        try:
+            return self.__get_client(self.name, token_key)
+        except ong_tsdb.exceptions.ProxyNotAuthorizedException:
+            self.logger.info("Could not get proxy authorization, retrying")
+            # Try again
+            return self.__get_client(self.name, token_key)
+
+    @property
+    def admin_client(self) -> OngTsdbClient:
+        return self.__client("admin_token")
+
+    @property
+    def write_client(self) -> OngTsdbClient:
+        return self.__client("write_token")
+
+
+class StorageBackend(abc.ABC):
+    """Storage of the settlement data of a market"""
+
+    def __init__(self, database: str, name: str, period: str, local_tz: str):
+        """
+        :param database: name of the database
+        :param name: name of the market (the sensor of the database)
+        :param period: period of the data (e.g. "1D" for daily data)
+        :param local_tz: time zone of the index of the DataFrames
+        """
+        self.database = database
+        self.name = name
+        self.period = period
+        self.local_tz = local_tz
+
+    @property
+    def is_daily_data(self) -> bool:
+        return self.period == "1D"
+
+    @abc.abstractmethod
+    def setup(self):
+        """Creates the database and the sensor if they do not exist"""
+        pass
+
+    @abc.abstractmethod
+    def last_date(self) -> pd.Timestamp | None:
+        """Returns the date of the last data stored (None if there is no data)"""
+        pass
+
+    @abc.abstractmethod
+    def read(self, date_from: pd.Timestamp = None, date_to: pd.Timestamp = None,
+             columns: pd.MultiIndex = None) -> pd.DataFrame:
+        """
+        Reads the data between date_from and date_to (both included and optional)
+        :param date_from: first date to read. None to read from the first date
+        :param date_to: last date to read. None to read till the last date
+        :param columns: if given, just these columns are read (columns with no data are not returned)
+        :return: a DataFrame with index in local tz and float64 values
+        """
+        pass
+
+    def columns(self) -> pd.MultiIndex | None:
+        """Returns the columns stored, without reading their data, or None if the backend cannot read them without
+        reading all data (then columns are not read lazily, see BaseDownloader.settle_xs)"""
+        return None
+
+    def dates(self, date_from: pd.Timestamp = None) -> pd.DatetimeIndex | None:
+        """Returns the dates stored since date_from (in local tz), without reading their data, or None if the backend
+        cannot read them without reading all data"""
+        return None
+
+    @abc.abstractmethod
+    def write(self, df: pd.DataFrame) -> bool:
+        """Writes all the values of df (any number of dates). Missing values delete stored values.
+        Returns True if data was written"""
+        pass
+
+    @abc.abstractmethod
+    def delete(self) -> bool:
+        """Deletes all the data of the market. Returns True if deleted"""
+        pass
+
+
+class TsdbStorage(StorageBackend):
+    """Storage in an ong_tsdb server. Data is stored as float32 and read fully: date range and columns are
+    filtered after reading"""
+
+    def __init__(self, database: str, name: str, period: str, local_tz: str):
+        super().__init__(database, name, period, local_tz)
+        self.__client = _OngTsdbClientManager(name)
+
+    @property
+    def admin_client(self):
+        return self.__client.admin_client
+
+    @property
+    def write_client(self):
+        return self.__client.write_client
+
+    def setup(self):
+        admin_client = self.admin_client
+        if not admin_client.exist_db(self.database):
+            admin_client.create_db(self.database)
+        if not admin_client.exist_sensor(self.database, self.name):
+            admin_client.create_sensor(self.database, self.name, self.period, [],
+                                       config("read_token"), config("write_token"),
+                                       level_names=df_index_columns)
+        else:
+            if not admin_client.get_metadata(self.database, self.name):
+                admin_client.set_level_names(self.database, self.name, df_index_columns)
+        admin_client.config_reload()  # Forces config reload in case external changes found
+
+    def last_date(self) -> pd.Timestamp | None:
+        # Admin client must be used, as it fails if sensor does not exist so there are no permissions for getting date
+        return self.write_client.get_lastdate(self.database, self.name)
+
+    def _read(self, date_from: pd.Timestamp, date_to: pd.Timestamp, columns: pd.MultiIndex) -> pd.DataFrame:
+        """Reads data from the client, returning it with the index and values as stored"""
+        return self.write_client.read(self.database, self.name, date_from)
+
+    def read(self, date_from: pd.Timestamp = None, date_to: pd.Timestamp = None,
+             columns: pd.MultiIndex = None) -> pd.DataFrame:
+        read_data = self._read(date_from, date_to, columns)
+        read_data.index = self._local_index(read_data.index)
+        if date_to is not None:
+            read_data = read_data[read_data.index <= date_to]
+        if columns is not None:
+            read_data = read_data.loc[:, read_data.columns.isin(columns)]
+        # convert to float64 avoiding float32 artifacts (e.g. 12.3 instead of 12.300000190734863)
+        return widen_float32_columns(read_data).astype(np.float64, copy=False)
+
+    def _local_index(self, index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+        """Converts an index read from the client to local tz"""
+        # index is read in utc. Convert to local tz if needed
+        if not index.tz:
+            index = index.tz_localize(self.local_tz)
+        if self.is_daily_data:
+            index = index.normalize()
+        return index
+
+    def write(self, df: pd.DataFrame) -> bool:
+        if self.is_daily_data:
+            # Assume UTC for storing data properly
+            df = df.set_axis(df.index.tz_localize(None), axis=0)
+        return self.write_client.write_df(self.database, self.name, df, fill_value=np.nan)
+
+    def delete(self) -> bool:
+        return self.admin_client.delete_sensor(self.database, self.name)
+
+
+class LocalStorage(TsdbStorage):
+    """Storage in local sqlite files. Date range and columns are filtered when reading"""
+
+    def __init__(self, database: str, name: str, period: str, local_tz: str):
+        super().__init__(database, name, period, local_tz)
+        self.client = LocalTsdbClient()
+
+    @property
+    def admin_client(self):
+        return self.client
+
+    @property
+    def write_client(self):
+        return self.client
+
+    def _read(self, date_from: pd.Timestamp, date_to: pd.Timestamp, columns: pd.MultiIndex) -> pd.DataFrame:
+        return self.client.read(self.database, self.name, date_from, date_to, columns=columns)
+
+    def columns(self) -> pd.MultiIndex | None:
+        return self.client.read_columns(self.database, self.name)
+
+    def dates(self, date_from: pd.Timestamp = None) -> pd.DatetimeIndex | None:
+        return self._local_index(self.client.read_dates(self.database, self.name, date_from))
+
+
+storage_backends = dict(ong_tsdb=TsdbStorage, local=LocalStorage)
+
+
+def register_storage_backend(name: str, backend: type):
+    """Makes a StorageBackend subclass available to be selected with "storage_backend: name" in the config file"""
+    if not issubclass(backend, StorageBackend):
+        raise TypeError(f"{backend} is not a StorageBackend")
+    storage_backends[name] = backend
+
+
+def get_storage_backend(database: str, name: str, period: str, local_tz: str) -> StorageBackend:
+    """Returns the storage backend configured in "storage_backend" (ong_tsdb by default) for a market"""
+    backend = config("storage_backend", "ong_tsdb")
+    if backend not in storage_backends:
+        raise ValueError(f"Invalid storage_backend {backend}. Valid values: {list(storage_backends)}")
+    return storage_backends[backend](database, name, period, local_tz)
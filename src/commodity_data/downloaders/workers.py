@@ -0,0 +1,133 @@
+"""
+Pools of worker threads shared by all downloaders.
+There is a single pool per market (created the first time it is needed and reused afterwards), so downloading
+several chunks or using several downloaders of the same market does not create new threads each time.
+Pool sizes can be configured per market in the config file, using the "max_concurrent_requests" key:
+    max_concurrent_requests:
+        Omip: 8
+        EEX: 2
+All pools are shut down at exit, or explicitly calling shutdown_worker_pools()
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import contextvars
+import functools
+import threading
+import time
+
+from commodity_data.globals import config, logger
+
+default_pool_size = 4
+
+
+class WorkerPool:
+    """A ThreadPoolExecutor that keeps track of its utilization"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.__executor = None
+        self.__lock = threading.Lock()
+        self.__created = None
+        self.__busy_time = 0.0
+        self.__submitted = 0
+        self.__completed = 0
+        self.__running = 0
+        self.__max_running = 0
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """Creates the executor the first time it is used"""
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                                        thread_name_prefix=f"cdty_{self.name}")
+                self.__created = time.monotonic()
+            return self.__executor
+
+    def __track(self, fn, *args, **kwargs):
+        """Runs fn updating usage counters"""
+        with self.__lock:
+            self.__running += 1
+            self.__max_running = max(self.__max_running, self.__running)
+        start = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self.__lock:
+                self.__running -= 1
+                self.__completed += 1
+                self.__busy_time += time.monotonic() - start
+
+    def submit(self, fn, *args, **kwargs) -> concurrent.futures.Future:
+        """Same as ThreadPoolExecutor.submit. Context variables of the caller are propagated to the worker"""
+        context = contextvars.copy_context()
+        future = self.executor.submit(context.run, self.__track, fn, *args, **kwargs)
+        with self.__lock:
+            self.__submitted += 1
+        return future
+
+    def map(self, fn, *iterables) -> list:
+        """Same as map(fn, *iterables) but running in the pool. Returns a list with the results in order"""
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return [future.result() for future in futures]
+
+    async def run(self, fn, *args, **kwargs):
+        """Awaits the execution of fn(*args, **kwargs) in the pool"""
+        return await asyncio.wrap_future(self.submit(functools.partial(fn, *args, **kwargs)))
+
+    def stats(self) -> dict:
+        """Returns a dict with the usage of the pool. Utilization is the fraction of time that workers were busy
+        since the pool was created"""
+        with self.__lock:
+            elapsed = time.monotonic() - self.__created if self.__created else 0
+            utilization = self.__busy_time / (elapsed * self.max_workers) if elapsed else 0
+            return dict(max_workers=self.max_workers, submitted=self.__submitted, completed=self.__completed,
+                        running=self.__running, max_running=self.__max_running,
+                        busy_time=round(self.__busy_time, 3), utilization=round(utilization, 4))
+
+    def shutdown(self, wait: bool = True):
+        """Shuts down the executor. It will be created again if the pool is used afterwards"""
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+__pools = dict()
+__pools_lock = threading.Lock()
+
+
+def get_worker_pool(name: str, max_workers: int = None) -> WorkerPool:
+    """
+    Returns the pool of workers for the given name (usually the market), creating it if it did not exist.
+    Its size is taken from the "max_concurrent_requests" config key for the name, then max_workers and if none
+    is defined from default_pool_size. Once created, the pool size does not change
+    """
+    with __pools_lock:
+        if name not in __pools:
+            size = config("max_concurrent_requests", dict()).get(name, max_workers or default_pool_size)
+            __pools[name] = WorkerPool(name, size)
+        return __pools[name]
+
+
+def worker_pools_stats() -> dict:
+    """Returns a dict with pool name as key and its stats as value"""
+    with __pools_lock:
+        pools = list(__pools.values())
+    return {pool.name: pool.stats() for pool in pools}
+
+
+def shutdown_worker_pools(wait: bool = True):
+    """Shuts down all pools, logging their utilization"""
+    with __pools_lock:
+        pools = list(__pools.values())
+    for pool in pools:
+        stats = pool.stats()
+        if stats['submitted']:
+            logger.debug(f"Shutting down worker pool {pool.name}: {stats}")
+        pool.shutdown(wait=wait)
+
+
+atexit.register(shutdown_worker_pools, wait=False)
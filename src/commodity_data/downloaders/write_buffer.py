@@ -0,0 +1,106 @@
+"""
+Buffer that coalesces the writes of downloaded data to the database.
+Each write to the database is a round-trip through the server (and its authentication proxy, if any), so writing
+every downloaded chunk on its own is slow for small incremental runs. Chunks are kept in memory and written together
+when the buffer exceeds a number of rows (as_of dates), a size in bytes or an age in seconds, and always when the
+download finishes, even if it failed. Limits can be configured in the config file:
+    write_buffer:
+        max_rows: 250           # use null for no limit
+        max_bytes: 33554432     # 32 MiB
+        max_seconds: 60         # max age of the buffered data, checked when new data is added
+Data with different columns is written separately, as missing values are stored as NaN and would overwrite
+stored values
+"""
+import threading
+import time
+from collections.abc import Callable
+
+import pandas as pd
+
+from commodity_data.globals import logger, config
+
+
+class WriteBuffer:
+    """Coalesces DataFrames written with write_function, calling it once per set of columns on each flush"""
+    max_rows = 250
+    max_bytes = 32 * 2 ** 20
+    max_seconds = 60
+
+    def __init__(self, write_function: Callable[[pd.DataFrame], object], name: str = ""):
+        """
+        :param write_function: function that writes a DataFrame to the database, raising an exception if it fails
+        :param name: name used in log messages
+        """
+        self.write_function = write_function
+        self.name = name
+        self.__lock = threading.RLock()
+        self.__blocks = dict()  # tuple of columns -> list of DataFrames
+        self.__callbacks = list()
+        self.__first_added = None
+        self.pending_rows = 0
+        self.pending_bytes = 0
+        limits = config("write_buffer", dict()) or dict()
+        self.max_rows = limits.get("max_rows", self.max_rows)
+        self.max_bytes = limits.get("max_bytes", self.max_bytes)
+        self.max_seconds = limits.get("max_seconds", self.max_seconds)
+
+    @property
+    def full(self) -> bool:
+        """True if buffered data exceeds any of the limits"""
+        if not self.__blocks:
+            return False
+        return any(limit is not None and value >= limit for value, limit in (
+            (self.pending_rows, self.max_rows), (self.pending_bytes, self.max_bytes),
+            (time.monotonic() - self.__first_added, self.max_seconds)))
+
+    def add(self, df: pd.DataFrame, on_flush: Callable[[], object] = None):
+        """
+        Adds df to the buffer, flushing it if any limit is exceeded
+        :param df: data to be written
+        :param on_flush: optional function called once df has been written (e.g. to update the download journal)
+        """
+        with self.__lock:
+            if not df.empty:
+                if not self.__blocks:
+                    self.__first_added = time.monotonic()
+                self.__blocks.setdefault(tuple(df.columns), list()).append(df)
+                self.pending_rows += len(df)
+                self.pending_bytes += int(df.memory_usage().sum())
+            if on_flush is not None:
+                self.__callbacks.append(on_flush)
+            if self.full:
+                self.flush()
+
+    def flush(self):
+        """Writes all buffered data. If a write fails, data not written is kept in the buffer and the error raised"""
+        with self.__lock:
+            blocks = list(self.__blocks.values())
+            while blocks:
+                dfs = blocks[0]
+                df = pd.concat(dfs) if len(dfs) > 1 else dfs[0]
+                # If a date was added several times, the last one is written
+                df = df[~df.index.duplicated(keep="last")].sort_index()
+                if len(dfs) > 1:
+                    logger.debug(f"Writing {len(dfs)} buffered chunks of {self.name} together")
+                self.write_function(df)
+                self.__blocks.pop(tuple(df.columns))
+                self.pending_rows -= sum(len(df) for df in dfs)
+                self.pending_bytes -= sum(int(df.memory_usage().sum()) for df in dfs)
+                blocks.pop(0)
+            self.__first_added = None
+            callbacks, self.__callbacks = self.__callbacks, list()
+            for callback in callbacks:
+                callback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Flushes the buffer. If exiting with an exception, errors flushing are logged so they do not replace it"""
+        if exc_type is None:
+            self.flush()
+            return
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Could not write buffered data of {self.name}: {e}")
@@ -0,0 +1,60 @@
+"""
+Tests for the integer coded catalog of settlement_df columns
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.catalog import SeriesCatalog
+from commodity_data.downloaders.series_config import df_index_columns
+
+
+class TestSeriesCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.columns = pd.MultiIndex.from_tuples([("Omip", "Power", "BL", area, product, offset, type_)
+                                                  for area in ("ES", "FR") for product in ("M", "Y")
+                                                  for offset in (0, 1, 2) for type_ in ("close", "maturity")],
+                                                 names=df_index_columns)
+        self.catalog = SeriesCatalog(self.columns)
+
+    def test_mask(self):
+        """Masks are the same as the ones calculated with get_level_values"""
+        expected = (self.columns.get_level_values("area") == "ES") & \
+                   self.columns.get_level_values("offset").isin([1, 2]) & \
+                   (self.columns.get_level_values("type") == "close")
+        np.testing.assert_array_equal(self.catalog.mask(area="ES", offset=[1, 2, 5], type="close", product=None),
+                                      expected)
+        np.testing.assert_array_equal(self.catalog.level_values("product"),
+                                      self.columns.get_level_values("product"))
+        with self.assertRaises(KeyError):
+            self.catalog.mask(area="DE")
+
+    def test_xs_mask(self):
+        """xs_mask raises KeyError as successive xs calls do, also for values that exist in other columns"""
+        df = pd.DataFrame(np.zeros((2, len(self.columns))), columns=self.columns)
+        expected = df.xs("ES", level="area", axis=1, drop_level=False).xs(1, level="offset", axis=1, drop_level=False)
+        selected = df.iloc[:, self.catalog.xs_mask(area="ES", offset=1)]
+        self.assertTrue(selected.columns.equals(expected.columns))
+        catalog = SeriesCatalog(self.columns[self.columns.get_level_values("area") != "FR"].append(
+            pd.MultiIndex.from_tuples([("Omip", "Power", "BL", "FR", "Y", 5, "close")], names=df_index_columns)))
+        with self.assertRaises(KeyError):
+            catalog.xs_mask(area="ES", offset=5)
+        self.assertFalse(catalog.xs_mask(area="ES", offset=[5]).any())
+
+    def test_groups(self):
+        """Positions of the columns grouped by the values of some levels"""
+        groups = self.catalog.groups(["area", "product"], self.catalog.mask(type="close"))
+        self.assertEqual(list(groups), [("ES", "M"), ("ES", "Y"), ("FR", "M"), ("FR", "Y")])
+        for (area, product), positions in groups.items():
+            self.assertTrue(all(self.columns[p][3:5] == (area, product) for p in positions))
+            self.assertEqual(len(positions), 3)
+
+    def test_cache(self):
+        self.assertIs(SeriesCatalog.of(self.columns), SeriesCatalog.of(self.columns))
+        self.assertEqual(len(SeriesCatalog(self.columns[:0])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Tests for the adaptive chunk sizes
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from commodity_data.downloaders.chunking import AdaptiveChunker
+
+
+class TestAdaptiveChunker(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = AdaptiveChunker.cache_file
+        AdaptiveChunker.cache_file = Path(self.tmp_dir.name) / "chunks.json"
+
+    def test_default_size(self):
+        """Without observations, the default size is used"""
+        self.assertEqual(AdaptiveChunker("test", default_size=30).chunk_size, 30)
+
+    def test_adapts_to_latency_and_size(self):
+        """Slow or heavy items give smaller chunks than fast and light ones"""
+        fast = AdaptiveChunker("fast", default_size=30, target_seconds=60, target_values=10_000)
+        fast.observe(10, elapsed=1, values=10 * 10)
+        slow = AdaptiveChunker("slow", default_size=30, target_seconds=60, target_values=10_000)
+        slow.observe(10, elapsed=100, values=10 * 10)
+        heavy = AdaptiveChunker("heavy", default_size=30, target_seconds=60, target_values=10_000)
+        heavy.observe(10, elapsed=1, values=10 * 2_000)
+        self.assertEqual(fast.chunk_size, fast.max_size)
+        self.assertEqual(slow.chunk_size, 6)
+        self.assertEqual(heavy.chunk_size, 5)
+
+    def test_errors_reduce_size(self):
+        chunker = AdaptiveChunker("errors", default_size=30, target_seconds=60)
+        chunker.observe(10, elapsed=10)
+        size = chunker.chunk_size
+        chunker.observe(10, elapsed=10, errors=10)
+        self.assertLess(chunker.chunk_size, size)
+
+    def test_persistence(self):
+        """Observations are available for new chunkers with the same key"""
+        chunker = AdaptiveChunker("persist", default_size=30, target_seconds=60)
+        chunker.observe(10, elapsed=100)
+        chunker.save()
+        self.assertEqual(AdaptiveChunker("persist", default_size=30, target_seconds=60).chunk_size,
+                         chunker.chunk_size)
+        self.assertEqual(AdaptiveChunker("other", default_size=30).chunk_size, 30)
+
+    def tearDown(self):
+        AdaptiveChunker.cache_file = self.cache_file
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
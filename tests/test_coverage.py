@@ -0,0 +1,60 @@
+"""
+Tests for the coverage index used to find missing data
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.coverage import CoverageIndex
+from commodity_data.downloaders.series_config import df_index_columns
+
+
+def settle_df(dates, series: dict) -> pd.DataFrame:
+    """Creates a settlement_df like DataFrame with close and maturity columns for each series (a dict of area and
+    the list of positions in dates with close values)"""
+    data = dict()
+    for area, positions in series.items():
+        close = np.full(len(dates), np.nan)
+        close[positions] = 1
+        data[("test", "Power", "BL", area, "Y", 1, "close")] = close
+        data[("test", "Power", "BL", area, "Y", 1, "maturity")] = list(dates)
+    df = pd.DataFrame(data, index=dates)
+    df.columns.names = df_index_columns
+    return df
+
+
+class TestCoverage(unittest.TestCase):
+
+    def setUp(self):
+        self.dates = pd.bdate_range("2024-01-01", periods=5, tz="Europe/Madrid")
+
+    def test_covered(self):
+        """Only dates with close values for the masked series are covered"""
+        coverage = CoverageIndex.from_dataframe(settle_df(self.dates, dict(ES=[0, 1], FR=[3])))
+        es = coverage.covered(self.dates, coverage.series_mask(area="ES"))
+        self.assertEqual(es.tolist(), [True, True, False, False, False])
+        all_areas = coverage.covered(self.dates, coverage.series_mask(market="test"))
+        self.assertEqual(all_areas.tolist(), [True, True, False, True, False])
+        self.assertFalse(coverage.covered(self.dates, coverage.series_mask(area="DE")).any())
+
+    def test_update(self):
+        """New dates and series are added to the coverage"""
+        coverage = CoverageIndex.from_dataframe(None)
+        self.assertFalse(coverage.covered(self.dates, coverage.series_mask()).any())
+        coverage.update(settle_df(self.dates[:2], dict(ES=[0, 1])))
+        coverage.update(settle_df(self.dates[3:], dict(FR=[1])))
+        self.assertEqual(coverage.covered(self.dates, coverage.series_mask(area="ES")).tolist(),
+                         [True, True, False, False, False])
+        self.assertEqual(coverage.covered(self.dates, coverage.series_mask(area="FR")).tolist(),
+                         [False, False, False, False, True])
+
+    def test_intraday(self):
+        """Intraday data covers the whole date"""
+        hours = pd.date_range("2024-01-01", periods=48, freq="1h", tz="Europe/Madrid")
+        coverage = CoverageIndex.from_dataframe(settle_df(hours, dict(ES=[30])))
+        self.assertEqual(coverage.covered(self.dates[:2], coverage.series_mask()).tolist(), [False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,16 @@
+import numpy as np
 import pandas as pd
 import unittest
 
+from tests.test_downloader.fake_downloader import TempCacheDirs
 from tests.test_downloader.fake_downloader_dataframe import FakeDownloaderDataFrame
 
 
 class TestDataConversions(unittest.TestCase):
 
     def setUp(self):
+        self.cache_dirs = TempCacheDirs()
+        self.cache_dirs.start()
         self.dl = FakeDownloaderDataFrame(pd.DataFrame(), product="H")
         n_data = 10
         today = pd.Timestamp.today().normalize().tz_localize("Europe/Madrid")
@@ -36,5 +40,43 @@ class TestDataConversions(unittest.TestCase):
                 self.assertTrue(df.equals(maturity_ts_df), "Conversion to ts and back to datetime failed")
         pass
 
+    def test_invalid_values(self):
+        """Missing and not positive timestamps are converted to NaT, and other columns are not copied"""
+        df = self.dfs["1h"]
+        ts_df = self.dl.maturity2timestamp(df)
+        ts_df.iloc[:3, 1] = [np.nan, 0, -5]
+        maturity_df = self.dl.maturity2datetime(ts_df)
+        self.assertTrue(maturity_df.iloc[:3, 1].isna().all())
+        self.assertTrue(maturity_df.iloc[3:, 1].equals(df.iloc[3:, 1]))
+        self.assertTrue(np.shares_memory(maturity_df.iloc[:, 0].to_numpy(), ts_df.iloc[:, 0].to_numpy()))
+        # Columns without any maturity keep a datetime dtype
+        ts_df.iloc[:, 1] = np.nan
+        self.assertEqual(self.dl.maturity2datetime(ts_df).dtypes.iloc[1], df.dtypes.iloc[1])
+
+    def test_daily_conversion(self):
+        """Maturities of daily data are stored as seconds unless maturity_days is set, then as days since epoch, and
+        data stored as seconds can still be read"""
+        daily_dl = FakeDownloaderDataFrame(pd.DataFrame(), product="M")
+        try:
+            index = pd.date_range("2024-03-28", freq="D", periods=5, tz="Europe/Madrid")    # Includes a DST change
+            df = pd.DataFrame(dict(close=range(len(index)), maturity=index), index=index)
+            df.columns = pd.MultiIndex.from_tuples([(c,) for c in df.columns], names=["type"])
+            self.assertFalse(daily_dl.maturity_days)
+            seconds_df = daily_dl.maturity2timestamp(df)
+            self.assertTrue((seconds_df.iloc[:, 1].to_numpy() == [d.timestamp() for d in index]).all())
+            self.assertTrue(df.equals(daily_dl.maturity2datetime(seconds_df)))
+            daily_dl.maturity_days = True
+            days_df = daily_dl.maturity2timestamp(df)
+            expected_days = (index.tz_localize(None) - pd.Timestamp("1970-01-01")).days
+            self.assertTrue((days_df.iloc[:, 1].to_numpy() == expected_days).all())
+            self.assertTrue(df.equals(daily_dl.maturity2datetime(days_df)))
+            # Legacy values stored as seconds, possibly mixed with days and with float32 rounding
+            legacy_df = days_df.copy()
+            legacy_df.iloc[:3, 1] = np.float32([d.timestamp() for d in index[:3]])
+            self.assertTrue(df.equals(daily_dl.maturity2datetime(legacy_df)))
+        finally:
+            daily_dl.delete_all_data(do_not_ask=True)
+
     def tearDown(self):
         self.dl.delete_all_data(do_not_ask=True)
+        self.cache_dirs.stop()
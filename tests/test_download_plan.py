@@ -0,0 +1,129 @@
+"""
+Tests for the planning of downloads: journal, empty results and coverage of configs that returned no data
+"""
+import datetime
+import unittest
+from dataclasses import dataclass
+
+import pandas as pd
+
+from commodity_data.downloaders.base_downloader import BaseDownloader
+from commodity_data.downloaders.series_config import CommodityCfg
+from tests.test_downloader.fake_downloader import FakeDownloader, FakeConfig, _FakeDownloadConfig, TempCacheDirs
+
+
+class TwoConfigDownloader(FakeDownloader):
+    """A fake downloader with two configs (areas A and B). Config B returns no data unless b_available"""
+
+    def __init__(self):
+        self.b_available = False
+        self.requests = list()
+        BaseDownloader.__init__(self, "fake_two_configs", None, None, None, roll_expirations=False)
+
+    def _create_config(self, config_field: str, class_schema, default_config_field: str):
+        return [FakeConfig(commodity_cfg=CommodityCfg(commodity="fake_commodity", instrument="fake_instrument",
+                                                      area=area),
+                           download_cfg=_FakeDownloadConfig(id=f"fake_id_{area}")) for area in ("A", "B")]
+
+    def _download_date(self, as_of: pd.Timestamp) -> pd.DataFrame | None:
+        configs = list(self._iter_download_config())
+        self.requests.append((as_of, sorted(cfg.id() for cfg in configs)))
+        data = [dict(maturity=as_of, offset=0, close=10, product="D", as_of=as_of, market=self.name(),
+                     **cfg.commodity_cfg.__dict__)
+                for cfg in configs if cfg.commodity_cfg.area == "A" or self.b_available]
+        if not data:
+            return None
+        return self._pivot_table(pd.DataFrame.from_records(data), value_columns=["close", "maturity"])
+
+    def requested(self, cfg_id: str) -> list:
+        return [as_of for as_of, cfg_ids in self.requests if cfg_id in cfg_ids]
+
+
+@dataclass
+class _FakeContractConfig(_FakeDownloadConfig):
+    expiry: datetime.date
+
+
+class ContractDownloader(TwoConfigDownloader):
+    """As TwoConfigDownloader, but configs are two contracts of the same commodity and product, told apart just by
+    their maturity (as Barchart futures). Contract B returns no data unless b_available"""
+    expiries = dict(A=datetime.date(2030, 1, 1), B=datetime.date(2030, 2, 1))
+
+    def _create_config(self, config_field: str, class_schema, default_config_field: str):
+        return [FakeConfig(commodity_cfg=CommodityCfg(commodity="fake_commodity", instrument="fake_instrument",
+                                                      area="A"),
+                           download_cfg=_FakeContractConfig(id=f"fake_id_{contract}", expiry=expiry))
+                for contract, expiry in self.expiries.items()]
+
+    def _config_series_filter(self, cfg) -> dict:
+        return dict(super()._config_series_filter(cfg), maturity=cfg.download_cfg.expiry)
+
+    def _download_date(self, as_of: pd.Timestamp) -> pd.DataFrame | None:
+        configs = list(self._iter_download_config())
+        self.requests.append((as_of, sorted(cfg.id() for cfg in configs)))
+        offsets = dict(fake_id_A=1, fake_id_B=2)
+        data = [dict(maturity=pd.Timestamp(cfg.download_cfg.expiry, tz=self.local_tz), offset=offsets[cfg.id()],
+                     close=10, product="M", as_of=as_of, market=self.name(), **cfg.commodity_cfg.__dict__)
+                for cfg in configs if cfg.id() == "fake_id_A" or self.b_available]
+        if not data:
+            return None
+        return self._pivot_table(pd.DataFrame.from_records(data), value_columns=["close", "maturity"])
+
+
+class TestDownloadPlan(unittest.TestCase):
+    downloader_class = TwoConfigDownloader
+
+    def setUp(self):
+        self.cache_dirs = TempCacheDirs()
+        self.cache_dirs.start()
+        self.downloader = self.downloader_class()
+        self.downloader.delete_all_data(do_not_ask=True)
+        self.downloader.download()
+        self.dates = sorted(set(self.downloader.requested("fake_id_A")))
+
+    def test_empty_config_not_journaled(self):
+        """A config that returned no data is not in the journal, and fill_gaps downloads it again"""
+        self.assertTrue(self.dates)
+        self.assertFalse(any(self.downloader.journal.is_complete(d, ["fake_id_B"]) for d in self.dates))
+        self.assertTrue(all(self.downloader.journal.is_complete(d, ["fake_id_A"]) for d in self.dates))
+        self.downloader.requests.clear()
+        self.downloader.b_available = True
+        self.downloader.download(start_date=self.dates[0], fill_gaps=True)
+        self.assertEqual(self.downloader.requested("fake_id_A"), [])
+        self.assertEqual(sorted(self.downloader.requested("fake_id_B")), self.dates)
+        cfg_b = next(cfg for cfg in self.downloader.download_config if cfg.id() == "fake_id_B")
+        self.assertTrue(self.downloader._config_covered(cfg_b, self.dates, self.downloader.coverage,
+                                                        self.downloader.settlement_df).all())
+
+    def test_fill_gaps_ignores_journal(self):
+        """With fill_gaps, a coverage gap is downloaded even if the journal says the date was stored"""
+        self.downloader.journal.add(self.dates, ["fake_id_B"])
+        self.downloader.load()
+        plan = self.downloader._plan_download(pd.DatetimeIndex(self.dates), fill_gaps=True)
+        self.assertEqual(list(plan), self.dates)
+        self.assertTrue(all(cfg_ids == {"fake_id_B"} for cfg_ids in plan.values()))
+
+    def test_empty_results_policy(self):
+        """Empty results of a config with other configs having data follow the recheck and ttl policy"""
+        self.downloader.load()
+        empty_results = self.downloader.empty_results
+        dates = pd.DatetimeIndex(self.dates)
+        # Checked too soon after as_of, so they are checked again
+        self.assertEqual(list(self.downloader._plan_download(dates, fill_gaps=True)), self.dates)
+        empty_results.recheck_days = 0
+        self.assertEqual(self.downloader._plan_download(dates, fill_gaps=True), dict())
+        empty_results.ttl_days = 0
+        self.assertEqual(list(self.downloader._plan_download(dates, fill_gaps=True)), self.dates)
+
+    def tearDown(self):
+        self.downloader.delete_all_data(do_not_ask=True)
+        self.cache_dirs.stop()
+
+
+class TestContractDownloadPlan(TestDownloadPlan):
+    """Same tests, with configs that share commodity_cfg and product"""
+    downloader_class = ContractDownloader
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,45 @@
 """
 Test downloader: creates a fake downloader for testing
 """
+import tempfile
+from pathlib import Path
+from unittest import mock
+
 import pandas as pd
 from dataclasses import dataclass
 
 from commodity_data.downloaders.base_downloader import BaseDownloader
+from commodity_data.downloaders.chunking import AdaptiveChunker
+from commodity_data.downloaders.empty_results import EmptyResultsCache
+from commodity_data.downloaders.journal import DownloadJournal
+from commodity_data.downloaders.local_tsdb import LocalTsdbClient
 from commodity_data.downloaders.series_config import CommodityCfg, _BaseDownloadConfig
+from commodity_data.downloaders.shared_matrix import SharedSettlementMatrix
+from commodity_data.downloaders.snapshot import SettlementSnapshot
+
+
+class TempCacheDirs:
+    """Redirects the files that downloaders keep in ~/.cache/ongpi (snapshots, journal, empty results, chunk sizes,
+    shared data and local database) to a temporary dir, between start() and stop()"""
+
+    def __init__(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        path = Path(self.tmp_dir.name)
+        self.patches = [mock.patch.object(SettlementSnapshot, "snapshot_dir", path / "snapshots"),
+                        mock.patch.object(DownloadJournal, "journal_dir", path / "journal"),
+                        mock.patch.object(EmptyResultsCache, "cache_dir", path / "empty_results"),
+                        mock.patch.object(AdaptiveChunker, "cache_file", path / "adaptive_chunks.json"),
+                        mock.patch.object(SharedSettlementMatrix, "shared_dir", path / "shared"),
+                        mock.patch.object(LocalTsdbClient, "default_path", path / "tsdb")]
+
+    def start(self):
+        for patch in self.patches:
+            patch.start()
+
+    def stop(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.tmp_dir.cleanup()
 
 
 @dataclass
@@ -0,0 +1,58 @@
+"""
+Tests for the cache of downloads that returned no data
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from commodity_data.downloaders.empty_results import EmptyResultsCache
+
+
+class TestEmptyResultsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = EmptyResultsCache.cache_dir
+        EmptyResultsCache.cache_dir = Path(self.tmp_dir.name)
+        self.as_of = pd.Timestamp("2024-01-01", tz="Europe/Madrid")
+
+    def test_persisted(self):
+        """Empty results survive new instances, just for the configs that were empty"""
+        cache = EmptyResultsCache("db", "test")
+        cache.add(self.as_of, ["a"], today=pd.Timestamp("2024-02-01"))
+        cache.save()
+        cache = EmptyResultsCache("db", "test")
+        today = pd.Timestamp("2024-03-01")
+        self.assertTrue(cache.is_empty(self.as_of, "a", today=today))
+        self.assertFalse(cache.is_empty(self.as_of, "b", today=today))
+        cache.discard(self.as_of, ["a"])
+        self.assertFalse(cache.is_empty(self.as_of, "a", today=today))
+
+    def test_recheck(self):
+        """Results checked too early or too long ago are checked again"""
+        cache = EmptyResultsCache("db", "test")
+        cache.add(self.as_of, ["a"], today=self.as_of + pd.offsets.Day(cache.recheck_days - 1))
+        cache.add(self.as_of, ["b"], today=self.as_of + pd.offsets.Day(cache.recheck_days))
+        today = self.as_of + pd.offsets.Day(cache.recheck_days + 1)
+        self.assertFalse(cache.is_empty(self.as_of, "a", today=today))
+        self.assertTrue(cache.is_empty(self.as_of, "b", today=today))
+        today = self.as_of + pd.offsets.Day(cache.recheck_days + cache.ttl_days)
+        self.assertFalse(cache.is_empty(self.as_of, "b", today=today))
+        cache.ttl_days = None
+        self.assertTrue(cache.is_empty(self.as_of, "b", today=today))
+
+    def test_clear(self):
+        cache = EmptyResultsCache("db", "test")
+        cache.add(self.as_of, ["a"], today=pd.Timestamp("2024-02-01"))
+        cache.clear()
+        self.assertFalse(EmptyResultsCache("db", "test").is_empty(self.as_of, "a"))
+
+    def tearDown(self):
+        EmptyResultsCache.cache_dir = self.cache_dir
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
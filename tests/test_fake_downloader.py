@@ -1,18 +1,28 @@
 """
 Tests for the fake downloader
 """
+import threading
+import time
+
 import pandas as pd
 import unittest
 
-from commodity_data.downloaders.base_downloader import _update_dataframe
-from tests.test_downloader.fake_downloader import FakeDownloader
+import numpy as np
+
+from commodity_data.downloaders.base_downloader import _update_dataframe, _delta_dataframe, BaseDownloader
+from commodity_data.downloaders.chunking import AdaptiveChunker
+from commodity_data.downloaders.write_buffer import WriteBuffer
+from tests.test_downloader.fake_downloader import FakeDownloader, TempCacheDirs
 from tests.test_downloader.fake_downloader_dataframe import FakeDownloaderDataFrame
+from unittest import mock
 
 
 class TestFakeDownloader(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
+        cls.cache_dirs = TempCacheDirs()
+        cls.cache_dirs.start()
         # Creates an empty downloader by removing all its data
         downloader = FakeDownloader()
         downloader.delete_all_data(do_not_ask=True)
@@ -89,11 +99,190 @@ class TestFakeDownloader(unittest.TestCase):
                 self.assertTrue(data_as_of[data.columns.difference(data_comp.columns)].isna().all().all(),
                                 f"Failed: data not downloaded is not null for {data_comp.index}")
 
+    def test_refresh(self):
+        """Test that refresh reads just new data and gets the same data as a full load"""
+        self.downloader.delete_all_data(do_not_ask=True)
+        self.downloader.download(end_date=self.downloader.min_date())
+        reader = FakeDownloader()
+        reader.load()
+        self.downloader.download()
+        self.assertGreater(reader.refresh(), 0, "No new data was read")
+        full = FakeDownloader()
+        full.snapshot.enabled = False
+        full.load()
+        pd.testing.assert_frame_equal(reader.settlement_df, full.settlement_df, check_freq=False)
+        self.assertEqual(reader.refresh(), 0)
+
+    def test_settle_xs_lazy(self):
+        """Test that settle_xs in a new downloader reads just the filtered columns and gets the same data"""
+        self.downloader.download()
+        self.downloader.load()      # Creates the local snapshot
+        lazy = FakeDownloader()
+        if not lazy.snapshot.enabled:
+            self.skipTest("Local snapshots are not available")
+        for filter_ in (dict(product="D"), dict(product="D", offset=1, type="close"), dict(product="M")):
+            with self.subTest(**filter_):
+                pd.testing.assert_frame_equal(lazy.settle_xs(**filter_), self.downloader.settle_xs(**filter_),
+                                              check_freq=False)
+        self.assertIsNone(lazy._BaseDownloader__settlement_df, "settlement_df was fully loaded")
+
+    def test_settle_xs_storage_columns(self):
+        """Test that without snapshot settle_xs reads from storage just the filtered columns, if storage can"""
+        self.downloader.download()
+        lazy = FakeDownloader()
+        lazy.snapshot.enabled = False
+        if lazy.storage.columns() is None:
+            self.skipTest("Storage cannot read columns without reading all data")
+        with mock.patch.object(lazy.storage, "read", wraps=lazy.storage.read) as read:
+            for filter_ in (dict(product="D"), dict(product="M", type="close")):
+                with self.subTest(**filter_):
+                    pd.testing.assert_frame_equal(lazy.settle_xs(**filter_), self.downloader.settle_xs(**filter_),
+                                                  check_freq=False)
+        self.assertIsNone(lazy._BaseDownloader__settlement_df, "settlement_df was fully loaded")
+        self.assertEqual(read.call_count, 2)
+        for call, product in zip(read.call_args_list, ("D", "M")):
+            columns = call.kwargs['columns']
+            self.assertEqual(set(columns.get_level_values("product")), {product})
+
+    def test_snapshot_not_rewritten(self):
+        """Loading without new data in the database does not write the snapshot again"""
+        self.downloader.download()
+        self.downloader.load()      # Creates the local snapshot
+        reader = FakeDownloader()
+        if not reader.snapshot.enabled:
+            self.skipTest("Local snapshots are not available")
+        with mock.patch.object(reader.snapshot, "write") as write:
+            reader.load()
+        write.assert_not_called()
+        pd.testing.assert_frame_equal(reader.settlement_df, self.downloader.settlement_df, check_freq=False)
+
+    def test_compact_prices(self):
+        """Test that with compact_prices settlement_df keeps float32 prices and settle_xs returns the same data"""
+        self.downloader.download()
+        self.downloader.load()
+        compact = FakeDownloader()
+        compact.compact_prices = True
+        compact.load()
+        settle = compact.settlement_df
+        prices = settle.columns.get_level_values("type") != "maturity"
+        self.assertTrue((settle.dtypes[prices] == np.float32).all())
+        pd.testing.assert_frame_equal(compact.settle_xs(product="D"), self.downloader.settle_xs(product="D"),
+                                      check_freq=False)
+        compact.roll_expiration()
+        self.assertTrue((compact.settlement_df.dtypes[prices] == np.float32).all())
+
     @classmethod
     def tearDownClass(cls):
         cls.downloader.delete_all_data(do_not_ask=True)
         if cls.downloader_fake_df:
             cls.downloader_fake_df.delete_all_data(do_not_ask=True)
+        cls.cache_dirs.stop()
+
+
+class TestDeltaDataFrame(unittest.TestCase):
+
+    def test_delta(self):
+        """Just changed rows and columns are returned, comparing floats as stored in database"""
+        index = pd.bdate_range("2024-01-01", periods=5, tz="Europe/Madrid")
+        old = pd.DataFrame(dict(a=[1.1, 2.2, np.nan, 4.4, 5.5], b=[1.0, 2.0, 3.0, 4.0, 5.0]), index=index)
+        # Values read from database are float32 widened to float64
+        old['c'] = np.float32([1 / 3] * 5).astype(np.float64)
+        new = old.copy()
+        new['c'] = 1 / 3
+        self.assertTrue(_delta_dataframe(old, new).empty)
+        new.iloc[3, 0] = 10
+        new.iloc[2, 0] = 3.3
+        new['d'] = [np.nan] * 4 + [1.0]
+        new.loc[index[-1] + pd.offsets.BDay(1)] = 6.0
+        delta = _delta_dataframe(old, new)
+        self.assertEqual(delta.index.tolist(), [index[2], index[3], index[4], index[-1] + pd.offsets.BDay(1)])
+        self.assertEqual(delta.columns.tolist(), ["a", "b", "c", "d"])
+        delta = _delta_dataframe(old, new.iloc[:4, :2])
+        self.assertEqual(delta.shape, (2, 1))
+        self.assertIs(_delta_dataframe(None, new), new)
+
+
+class SlowTransformDownloader(FakeDownloader):
+    """A fake downloader whose downloaded data takes time to be transformed"""
+    max_concurrent_requests = 2
+    pipeline_queue_size = 1
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = self.transformed = self.max_ahead = 0
+        BaseDownloader.__init__(self, "fake_slow_transform", None, None, None, roll_expirations=False)
+
+    def min_date(self):
+        return self.today_local() - pd.offsets.BDay(30)
+
+    def _chunker(self, purpose: str, default_size: int, **kwargs) -> AdaptiveChunker:
+        return AdaptiveChunker(f"{self.name()} {purpose}", default_size=1, max_size=1)
+
+    def _download_date(self, as_of: pd.Timestamp) -> pd.DataFrame:
+        with self.lock:
+            self.started += 1
+            self.max_ahead = max(self.max_ahead, self.started - self.transformed)
+        return self.generate_fake_data(as_of)
+
+    def _transform_downloaded(self, dfs: list) -> list:
+        time.sleep(0.02)
+        retval = super()._transform_downloaded(dfs)
+        with self.lock:
+            self.transformed += len(dfs)
+        return retval
+
+
+class TestDownloadPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dirs = TempCacheDirs()
+        self.cache_dirs.start()
+
+    def tearDown(self):
+        self.cache_dirs.stop()
+
+    def test_backpressure(self):
+        """Dates are not downloaded faster than they are transformed: downloads wait when queues are full"""
+        downloader = SlowTransformDownloader()
+        downloader.delete_all_data(do_not_ask=True)
+        try:
+            n_dates = downloader.download()
+            self.assertGreater(n_dates, 20)
+            self.assertEqual(downloader.transformed, n_dates)
+            # Dates in flight, a chunk waiting for the queue, the ones in the queue and one being transformed. Chunks
+            # might have up to max_concurrent_requests dates, as several downloads can finish at the same time
+            self.assertLessEqual(downloader.max_ahead,
+                                 downloader.max_concurrent_requests * (downloader.pipeline_queue_size + 3))
+        finally:
+            downloader.delete_all_data(do_not_ask=True)
+
+    def test_store_error(self):
+        """If storing fails, data already added to settlement_df is still written to the database"""
+        downloader = SlowTransformDownloader()
+        downloader.delete_all_data(do_not_ask=True)
+        dump = downloader._dump
+        failures = list()
+
+        def failing_dump(df):
+            if not failures:
+                time.sleep(0.1)     # Meanwhile, next chunks are transformed
+                failures.append(df)
+                raise ConnectionError("Could not write")
+            return dump(df)
+
+        try:
+            downloader.load()
+            downloader._dump = failing_dump
+            with mock.patch.object(WriteBuffer, "max_rows", 1), self.assertRaises(ConnectionError):
+                downloader.download()
+            in_memory = downloader.settlement_df
+            self.assertGreater(len(in_memory), 1)
+            stored = SlowTransformDownloader()
+            stored.snapshot.enabled = False
+            stored.load()
+            pd.testing.assert_frame_equal(stored.settlement_df, in_memory.sort_index(axis=1), check_freq=False)
+        finally:
+            downloader.delete_all_data(do_not_ask=True)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,63 @@
+"""
+Tests for the on-disk cache of http responses
+"""
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from ong_utils import get_cookies
+
+from commodity_data.downloaders.base_downloader import _HttpGet
+from commodity_data.downloaders.http_cache import HttpCache, HttpCacheMissError
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = HttpCache(self.tmp_dir.name, "record")
+        patcher = patch("commodity_data.downloaders.base_downloader.get_http_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.http_get = _HttpGet()
+        self.http_get.http = MagicMock()
+        self.http_get.http.request.return_value = MagicMock(status=200, reason="OK", data=b"<html>data</html>",
+                                                            headers={"Set-Cookie": "token=abc; Path=/"})
+
+    def test_record_replay(self):
+        """Recorded responses are replayed without connecting, other modes always connect"""
+        url, params = "https://test.cache/data", dict(date="2024-01-01")
+        self.http_get.http_get(url, params)
+        self.assertEqual(self.http_get.http.request.call_count, 1)
+        self.cache.mode = "replay"
+        response = self.http_get.http_get(url, params)
+        self.assertEqual(self.http_get.http.request.call_count, 1)
+        self.assertEqual(response.data, b"<html>data</html>")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(get_cookies(response), dict(token="abc"))
+        # A different request is not in the cache, and replay does not connect to get it
+        with self.assertRaises(HttpCacheMissError):
+            self.http_get.http_get(url, dict(date="2024-01-02"))
+        self.assertEqual(self.http_get.http.request.call_count, 1)
+        self.cache.mode = "bypass"
+        self.http_get.http_get(url, params)
+        self.assertEqual(self.http_get.http.request.call_count, 2)
+
+    def test_errors_not_recorded(self):
+        self.http_get.http.request.return_value = MagicMock(status=404, reason="Not found", headers=dict())
+        with self.assertRaises(ConnectionError):
+            self.http_get.http_get("https://test.cache/missing")
+        self.cache.mode = "replay"
+        with self.assertRaises(HttpCacheMissError):
+            self.cache.get("https://test.cache/missing")
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            self.cache.mode = "invalid"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests for rate limits and retries of http requests
+"""
+import http.server
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+import urllib3
+
+from commodity_data.downloaders.base_downloader import _HttpGet
+from commodity_data.downloaders.http_limits import TokenBucket, HttpLimits, parse_retry_after
+
+
+def response(status: int, headers: dict = None):
+    return MagicMock(status=status, reason="reason", headers=headers or dict(), data=b"data")
+
+
+class TestHttpLimits(unittest.TestCase):
+
+    def test_token_bucket(self):
+        """After the burst, requests are limited to rate per second"""
+        bucket = TokenBucket(rate=50, burst=5)
+        start = time.monotonic()
+        for _ in range(15):
+            bucket.acquire()
+        elapsed = time.monotonic() - start
+        self.assertGreaterEqual(elapsed, 10 / 50 * 0.9)
+        self.assertLess(elapsed, 1)
+
+    def test_backoff(self):
+        limits = HttpLimits(backoff=1, max_backoff=3)
+        for attempt in range(5):
+            self.assertLessEqual(limits.backoff_delay(attempt), min(3, 2 ** attempt))
+        self.assertEqual(limits.backoff_delay(10, retry_after=7), 7)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("3"), 3)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("not a date"))
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+
+    @patch("commodity_data.downloaders.base_downloader.time.sleep")
+    def test_retries(self, sleep):
+        """Throttled requests are retried waiting as requested, other errors are not"""
+        # time.sleep is patched, so the bucket of the host does not really wait
+        http_get = _HttpGet()
+        http_get._HttpGet__http_limits = HttpLimits(rate=None, max_retries=2)
+        http_get.http = MagicMock()
+        http_get.http.request.side_effect = [response(429, {"Retry-After": "2"}), response(200)]
+        self.assertEqual(http_get.http_get("https://test.retry").status, 200)
+        self.assertAlmostEqual(sleep.call_args[0][0], 2, delta=0.1)
+
+        http_get.http.request.side_effect = [response(503)] * 3
+        with self.assertRaises(ConnectionError):
+            http_get.http_get("https://test.retry")
+        self.assertEqual(http_get.http.request.call_count, 2 + 3)
+
+        http_get.http.request.side_effect = [response(404)]
+        with self.assertRaises(ConnectionError):
+            http_get.http_get("https://test.retry")
+        self.assertEqual(http_get.http.request.call_count, 2 + 3 + 1)
+
+    def test_retries_pool_manager(self):
+        """Through a real PoolManager with its own retries, just the retries of http_get are done"""
+        requests = list()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append(self.path)
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            http_get = _HttpGet()
+            http_get._HttpGet__http_limits = HttpLimits(rate=None, max_retries=2)
+            # Same retries as the pool manager of ong_utils
+            http_get.http = urllib3.PoolManager(retries=urllib3.util.Retry(status=10, backoff_factor=0.15))
+            with patch("commodity_data.downloaders.http_limits.TokenBucket.pause") as pause:
+                with self.assertRaises(ConnectionError):
+                    http_get.http_get(f"http://127.0.0.1:{server.server_port}/throttled")
+            self.assertEqual(len(requests), 3)
+            self.assertEqual(pause.call_count, 2)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
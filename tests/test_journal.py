@@ -0,0 +1,83 @@
+"""
+Tests for the download journal used to resume downloads
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from commodity_data.downloaders.journal import DownloadJournal
+
+
+class TestDownloadJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.journal_dir = DownloadJournal.journal_dir
+        DownloadJournal.journal_dir = Path(self.tmp_dir.name)
+        self.dates = pd.bdate_range("2024-01-01", periods=10, tz="Europe/Madrid")
+
+    def test_complete(self):
+        """Dates are complete only if all the configs were stored, and survive new instances"""
+        journal = DownloadJournal("db", "test")
+        journal.add(self.dates[:5], ["a", "b"])
+        journal.add(self.dates[5:], ["a"])
+        journal = DownloadJournal("db", "test")
+        self.assertTrue(all(journal.is_complete(d, ["a", "b"]) for d in self.dates[:5]))
+        self.assertFalse(any(journal.is_complete(d, ["a", "b"]) for d in self.dates[5:]))
+        self.assertTrue(all(journal.is_complete(d, ["a"]) for d in self.dates))
+
+    def test_pending_run(self):
+        """Unfinished runs are kept until finished"""
+        journal = DownloadJournal("db", "test")
+        journal.start_run(self.dates[2], self.dates[-1])
+        journal = DownloadJournal("db", "test")
+        self.assertFalse(journal.in_pending_run(self.dates[0]))
+        self.assertTrue(journal.in_pending_run(self.dates[3]))
+        journal.start_run(self.dates[0], self.dates[1])
+        self.assertEqual(journal.pending_run, (self.dates[0], self.dates[-1]))
+        journal.finish_run()
+        self.assertFalse(DownloadJournal("db", "test").in_pending_run(self.dates[3]))
+
+    def test_remove_and_clear(self):
+        journal = DownloadJournal("db", "test")
+        journal.add(self.dates, ["a"])
+        journal.remove(self.dates[2], self.dates[3])
+        self.assertEqual([journal.is_complete(d, ["a"]) for d in self.dates[:5]],
+                         [True, True, False, False, True])
+        journal.clear()
+        self.assertFalse(any(DownloadJournal("db", "test").is_complete(d, ["a"]) for d in self.dates))
+
+    def test_append_log(self):
+        """Updates append to the log without rewriting the journal, and the log is compacted on load"""
+        journal = DownloadJournal("db", "test")
+        journal.add(self.dates[:2], ["a"])
+        journal = DownloadJournal("db", "test")
+        self.assertFalse(journal.log_file.exists())
+        base = journal.file.read_text()
+        log_sizes = list()
+        for as_of in self.dates[2:]:
+            journal.add([as_of], ["a"], save=False)
+            journal.save()
+            log_sizes.append(journal.log_file.stat().st_size)
+        self.assertEqual(journal.file.read_text(), base)
+        self.assertEqual(len(set(log_sizes)), len(log_sizes))
+        journal.remove(self.dates[0], self.dates[0])
+        journal.start_run(self.dates[0], self.dates[-1])
+        # An incomplete record, as if the process died while writing it, is ignored
+        with open(journal.log_file, "a") as f:
+            f.write('{"add": {"a": ["2024-')
+        journal = DownloadJournal("db", "test")
+        self.assertFalse(journal.log_file.exists())
+        self.assertEqual([journal.is_complete(d, ["a"]) for d in self.dates], [False] + [True] * 9)
+        self.assertEqual(journal.pending_run, (self.dates[0], self.dates[-1]))
+        self.assertEqual(DownloadJournal("db", "test").completed, journal.completed)
+
+    def tearDown(self):
+        DownloadJournal.journal_dir = self.journal_dir
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
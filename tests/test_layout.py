@@ -0,0 +1,67 @@
+"""
+Tests for the conversions between wide and long layouts
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.layout import wide_to_long, long_to_wide, long_columns
+from commodity_data.downloaders.series_config import df_index_columns
+from commodity_data.downloaders.snapshot import SettlementSnapshot
+
+
+class TestLayout(unittest.TestCase):
+
+    def setUp(self):
+        dates = pd.bdate_range("2024-01-01", periods=20, tz="Europe/Madrid", name="as_of")
+        columns = pd.MultiIndex.from_tuples([("test", "Power", "BL", "ES", product, offset, type_)
+                                             for product in ("M", "Y") for offset in (1, 2)
+                                             for type_ in ("adj_close", "close", "maturity")],
+                                            names=df_index_columns)
+        rng = np.random.default_rng(0)
+        values = rng.random((len(dates), len(columns)))
+        values[rng.random(values.shape) < 0.6] = np.nan
+        self.df = pd.DataFrame(values, index=dates, columns=columns)
+
+    def test_roundtrip(self):
+        """Converting to long and back returns the same data, without empty rows and columns"""
+        long_df = wide_to_long(self.df)
+        self.assertEqual(list(long_df.columns), long_columns)
+        self.assertEqual(len(long_df), self.df.count().sum())
+        expected = self.df.dropna(how="all").dropna(axis=1, how="all")
+        pd.testing.assert_frame_equal(long_to_wide(long_df), expected, check_freq=False)
+
+    def test_empty(self):
+        """Empty frames are converted to empty frames"""
+        long_df = wide_to_long(self.df.iloc[:0])
+        self.assertEqual(list(long_df.columns), long_columns)
+        self.assertTrue(long_to_wide(long_df).empty)
+        self.assertEqual(long_to_wide(long_df).index.name, "as_of")
+
+    def test_long_snapshot(self):
+        """Snapshots stored in long layout return the same data than in wide layout"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot_dir = SettlementSnapshot.snapshot_dir
+            SettlementSnapshot.snapshot_dir = Path(tmp_dir)
+            try:
+                snapshot = SettlementSnapshot("db", "test")
+                if not snapshot.enabled:
+                    self.skipTest("pyarrow not available")
+                snapshot.layout = "long"
+                df = self.df.dropna(how="all")
+                snapshot.write(df, df.index[-1] + pd.offsets.BDay())
+                read_df, _ = snapshot.read()
+                pd.testing.assert_frame_equal(read_df, df.dropna(axis=1, how="all"), check_freq=False)
+                pd.testing.assert_index_equal(snapshot.columns(), read_df.columns)
+                columns = list(df.columns[[1, 5]])
+                read_df, _ = snapshot.read(columns)
+                pd.testing.assert_frame_equal(read_df, df[columns].dropna(how="all"), check_freq=False)
+            finally:
+                SettlementSnapshot.snapshot_dir = snapshot_dir
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for the local sqlite replacement of OngTsdbClient
+"""
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.local_tsdb import LocalTsdbClient
+from commodity_data.downloaders.series_config import df_index_columns
+
+
+class TestLocalTsdbClient(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.client = LocalTsdbClient(self.tmp_dir.name)
+        self.client.create_db("db")
+        self.client.create_sensor("db", "test", "1D", [], level_names=df_index_columns)
+        dates = pd.bdate_range("2024-01-01", periods=10, name="as_of")
+        columns = pd.MultiIndex.from_tuples([("test", "Power", "BL", "ES", "Y", 1, "close"),
+                                             ("test", "Power", "BL", "ES", "Y", 1, "maturity")],
+                                            names=df_index_columns)
+        self.df = pd.DataFrame(np.random.rand(len(dates), len(columns)), index=dates, columns=columns)
+
+    def test_sensors(self):
+        self.assertTrue(self.client.exist_db("db"))
+        self.assertTrue(self.client.exist_sensor("db", "test"))
+        self.assertEqual(self.client.get_metadata("db", "test"), df_index_columns)
+        self.assertIsNone(self.client.get_lastdate("db", "test"))
+        self.assertTrue(self.client.read("db", "test").empty)
+        self.assertTrue(self.client.delete_sensor("db", "test"))
+        self.assertFalse(self.client.exist_sensor("db", "test"))
+        self.assertFalse(self.client.delete_sensor("db", "test"))
+
+    def test_write_read(self):
+        """Data is read as written, and missing values delete just the written cells"""
+        self.assertTrue(self.client.write_df("db", "test", self.df, fill_value=np.nan))
+        self.assertEqual(self.client.get_lastdate("db", "test"), self.df.index[-1])
+        pd.testing.assert_frame_equal(self.client.read("db", "test"), self.df, check_freq=False)
+        # Read from a date with time zone, as BaseDownloader does
+        date_from = self.df.index[5].tz_localize("Europe/Madrid")
+        pd.testing.assert_frame_equal(self.client.read("db", "test", date_from), self.df.iloc[5:],
+                                      check_freq=False)
+        deleted = self.df.iloc[-2:, :1] * np.nan
+        self.client.write_df("db", "test", deleted, fill_value=np.nan)
+        expected = self.df.copy()
+        expected.iloc[-2:, 0] = np.nan
+        pd.testing.assert_frame_equal(self.client.read("db", "test"), expected, check_freq=False)
+
+    def test_read_many_columns(self):
+        """Columns can be more than the limit of parameters of a sqlite query (999 in old sqlite versions)"""
+        def connect(*args, **kwargs):
+            con = sqlite_connect(*args, **kwargs)
+            con.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+            return con
+
+        sqlite_connect = sqlite3.connect
+        self.client.write_df("db", "test", self.df, fill_value=np.nan)
+        columns = self.df.columns.append(pd.MultiIndex.from_tuples(
+            [("test", "Power", "BL", "ES", "M", offset, "close") for offset in range(2000)], names=df_index_columns))
+        with mock.patch("sqlite3.connect", connect):
+            df = self.client.read("db", "test", columns=columns)
+        pd.testing.assert_frame_equal(df, self.df, check_freq=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
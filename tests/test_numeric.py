@@ -0,0 +1,43 @@
+"""
+Tests for the conversion of float32 values to float64
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.numeric import widen_float32, widen_float32_columns
+
+
+class TestWidenFloat32(unittest.TestCase):
+
+    def test_same_as_str(self):
+        """Values are the same as converting through str, for any float32"""
+        rng = np.random.default_rng(0)
+        values = np.concatenate([
+            np.round(rng.uniform(0, 300, 10_000), 2),
+            rng.uniform(0, 300, 10_000),
+            rng.integers(1.1e9, 2e9, 10_000).astype(np.float64),
+            rng.uniform(-1, 1, 10_000) * 10.0 ** rng.integers(-40, 38, 10_000),
+            [0, -0.0, np.nan, np.inf, -np.inf, 1e-45, 3.4e38, 12.3],
+        ]).astype(np.float32)
+        expected = values.astype(str).astype(np.float64)
+        np.testing.assert_array_equal(widen_float32(values), expected)
+        self.assertEqual(widen_float32(np.float32([12.3]))[0], 12.3)
+        np.testing.assert_array_equal(widen_float32(values.reshape(-1, 8)), expected.reshape(-1, 8))
+
+    def test_columns(self):
+        """Only float32 columns are converted"""
+        df = pd.DataFrame(dict(a=np.float32([1.1, np.nan]), b=[1.1, 2.2], c=pd.to_datetime(["2024-01-01"] * 2)))
+        retval = widen_float32_columns(df)
+        self.assertEqual(retval['a'].tolist()[0], 1.1)
+        self.assertEqual(retval.dtypes.tolist(), [np.float64, np.float64, df.dtypes['c']])
+        pd.testing.assert_frame_equal(retval[['b', 'c']], df[['b', 'c']])
+        # All float32 columns, whose values are not in C order
+        df = pd.DataFrame(dict(a=np.float32([12.3, 12.4]), b=np.float32([12.5, 12.6])))
+        self.assertEqual(widen_float32_columns(df).to_numpy().tolist(), [[12.3, 12.5], [12.4, 12.6]])
+        self.assertEqual(widen_float32(np.asfortranarray(df.to_numpy())).tolist(), [[12.3, 12.5], [12.4, 12.6]])
+
+
+if __name__ == '__main__':
+    unittest.main()
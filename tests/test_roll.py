@@ -9,7 +9,7 @@ import pandas as pd
 
 from commodity_data import CommodityData
 from commodity_data.downloaders.continuous_prices import calculate_continuous_prices, roll, consecutive
-from commodity_data.downloaders.series_config import TypeColumn
+from commodity_data.downloaders.series_config import TypeColumn, df_index_columns
 
 
 def pandas_fill(arr):
@@ -87,6 +87,24 @@ class TestDownloader(TestCase):
                                      msg=f"Failed in test case {idx}: {test}")
             print(f"Test case {idx} OK")
 
+    def test_roll_float32(self):
+        """Float32 prices (as kept with compact_prices) give the same continuous prices as float64 ones"""
+        dates = pd.bdate_range("2024-01-01", "2024-03-29", tz="Europe/Madrid", name="as_of")
+        columns = pd.MultiIndex.from_tuples([("test", "Power", "BL", "ES", "M", offset, type_)
+                                             for offset in (1, 2, 3) for type_ in ("close", "maturity")],
+                                            names=df_index_columns)
+        settle = pd.DataFrame(index=dates, columns=columns)
+        for offset in (1, 2, 3):
+            maturity = (dates.tz_localize(None).to_period("M") + offset).to_timestamp().tz_localize("Europe/Madrid")
+            settle[columns[2 * offset - 1]] = maturity
+            settle[columns[2 * offset - 2]] = np.round(12.3 + 0.1 * offset + 0.01 * np.arange(len(dates)), 2)
+        compact = settle.astype({col: np.float32 for col in columns[::2]})
+        expected = calculate_continuous_prices(settle).xs(TypeColumn.adj_close, level="type", axis=1)
+        self.assertFalse(expected.empty)
+        pd.testing.assert_frame_equal(
+            calculate_continuous_prices(compact).xs(TypeColumn.adj_close, level="type", axis=1), expected,
+            check_exact=True)
+
     def test_roll_expiration_omip(self):
         """Tests that adj_close values in Omip are valid, e.g. have no too many nans"""
         market = "Omip"
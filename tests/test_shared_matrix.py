@@ -0,0 +1,65 @@
+"""
+Tests for the settlement data shared between processes
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.series_config import df_index_columns
+from commodity_data.downloaders.shared_matrix import SharedSettlementMatrix
+from tests.test_downloader.fake_downloader import FakeDownloader, TempCacheDirs
+
+
+class TestSharedSettlementMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dirs = TempCacheDirs()
+        self.cache_dirs.start()
+        dates = pd.bdate_range("2024-01-01", periods=10, tz="Europe/Madrid", name="as_of")
+        columns = pd.MultiIndex.from_tuples([("test", "Power", "BL", "ES", "Y", 1, type_)
+                                             for type_ in ("adj_close", "close", "maturity")],
+                                            names=df_index_columns)
+        self.df = pd.DataFrame(np.random.rand(len(dates), len(columns)), index=dates, columns=columns)
+        self.df[columns[-1]] = pd.Series(pd.Timestamp("2025-01-01", tz="Europe/Madrid").as_unit("ns"), index=dates)
+        self.df.iloc[3, 0] = np.nan
+        self.df.iloc[4, 2] = pd.NaT
+
+    def test_publish_attach(self):
+        """Attached data equals published data, and it is read-only"""
+        shared = SharedSettlementMatrix("db", "test")
+        self.assertIsNone(shared.attach())
+        shared.publish(self.df)
+        attached = SharedSettlementMatrix("db", "test").attach()
+        pd.testing.assert_frame_equal(attached, self.df, check_freq=False)
+        with self.assertRaises(ValueError):
+            attached.iloc[0, 0] = 1
+        # Publishing again replaces the previous version
+        shared.publish(self.df.iloc[:5])
+        self.assertEqual(len(shared.attach()), 5)
+        self.assertEqual(len(attached), 10)
+        shared.clear()
+        self.assertIsNone(shared.attach())
+
+    def test_delete_dates_attached(self):
+        """delete_dates works with attached data, copying it instead of changing the shared one"""
+        downloader = FakeDownloader()
+        downloader.delete_all_data(do_not_ask=True)
+        downloader.download()
+        downloader.publish()
+        attached = FakeDownloader()
+        self.assertTrue(attached.attach())
+        as_of = attached.settlement_df.index[0]
+        attached.delete_dates(as_of, as_of, reload=False)
+        self.assertTrue(attached.settlement_df.loc[as_of].isna().all())
+        self.assertFalse(downloader.shared_matrix.attach().loc[as_of].isna().all())
+        downloader.load()
+        self.assertTrue(downloader.settlement_df.reindex([as_of]).isna().all(axis=None))
+        downloader.delete_all_data(do_not_ask=True)
+
+    def tearDown(self):
+        self.cache_dirs.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
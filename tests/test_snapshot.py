@@ -0,0 +1,59 @@
+"""
+Tests for the local snapshot of settlement data
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.series_config import df_index_columns
+from commodity_data.downloaders.snapshot import SettlementSnapshot
+
+
+class TestSettlementSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.snapshot_dir = SettlementSnapshot.snapshot_dir
+        SettlementSnapshot.snapshot_dir = Path(self.tmp_dir.name)
+        dates = pd.bdate_range("2024-01-01", periods=10, tz="Europe/Madrid")
+        columns = pd.MultiIndex.from_tuples([("test", "Power", "BL", "ES", "Y", 1, "close"),
+                                             ("test", "Power", "BL", "ES", "Y", 1, "maturity")],
+                                            names=df_index_columns)
+        self.df = pd.DataFrame(np.random.rand(len(dates), len(columns)), index=dates, columns=columns)
+
+    def test_roundtrip(self):
+        """Snapshot returns the data before the synced date with the same columns"""
+        snapshot = SettlementSnapshot("db", "test")
+        if not snapshot.enabled:
+            self.skipTest("pyarrow not available")
+        self.assertEqual(snapshot.read(), (None, None))
+        synced_to = self.df.index[-1]
+        snapshot.write(self.df, synced_to)
+        df, read_synced_to = SettlementSnapshot("db", "test").read()
+        self.assertEqual(read_synced_to, synced_to)
+        pd.testing.assert_frame_equal(df, self.df.iloc[:-1], check_freq=False)
+
+    def test_invalidate(self):
+        """Invalidation moves synced date back, but never forward"""
+        snapshot = SettlementSnapshot("db", "test")
+        if not snapshot.enabled:
+            self.skipTest("pyarrow not available")
+        snapshot.write(self.df, self.df.index[-1])
+        snapshot.invalidate(self.df.index[3])
+        snapshot.invalidate(self.df.index[5])
+        df, synced_to = snapshot.read()
+        self.assertEqual(synced_to, self.df.index[3])
+        self.assertEqual(len(df), 3)
+        snapshot.clear()
+        self.assertEqual(snapshot.read(), (None, None))
+
+    def tearDown(self):
+        SettlementSnapshot.snapshot_dir = self.snapshot_dir
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Tests for the storage backends
+"""
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.local_tsdb import LocalTsdbClient
+from commodity_data.downloaders.series_config import df_index_columns
+from commodity_data.downloaders import storage
+from commodity_data.downloaders.storage import LocalStorage, register_storage_backend, TsdbStorage
+
+
+class TestLocalStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.default_path = LocalTsdbClient.default_path
+        LocalTsdbClient.default_path = Path(self.tmp_dir.name)
+        self.storage = LocalStorage("db", "test", "1D", "Europe/Madrid")
+        self.storage.setup()
+        dates = pd.bdate_range("2024-01-01", periods=10, tz="Europe/Madrid", name="as_of")
+        columns = pd.MultiIndex.from_tuples([("test", "Power", "BL", "ES", product, 1, type_)
+                                             for product in ("M", "Y") for type_ in ("close", "maturity")],
+                                            names=df_index_columns)
+        self.df = pd.DataFrame(np.random.rand(len(dates), len(columns)), index=dates, columns=columns)
+
+    def test_read(self):
+        """Data is read with local dates, filtering dates and columns"""
+        self.assertIsNone(self.storage.last_date())
+        self.assertTrue(self.storage.write(self.df))
+        self.assertEqual(self.storage.last_date(), self.df.index[-1].tz_localize(None))
+        pd.testing.assert_frame_equal(self.storage.read(), self.df, check_freq=False)
+        columns = self.df.columns[[0, 3]]
+        expected = self.df.loc[self.df.index[2]:self.df.index[5], columns]
+        pd.testing.assert_frame_equal(self.storage.read(self.df.index[2], self.df.index[5], columns=columns),
+                                      expected, check_freq=False)
+        pd.testing.assert_index_equal(self.storage.columns(), self.df.columns)
+        pd.testing.assert_index_equal(self.storage.dates(self.df.index[2]), self.df.index[2:], exact=False)
+        self.assertTrue(self.storage.delete())
+
+    def test_register(self):
+        with self.assertRaises(TypeError):
+            register_storage_backend("invalid", dict)
+
+    def tearDown(self):
+        LocalTsdbClient.default_path = self.default_path
+        self.tmp_dir.cleanup()
+
+
+class TestTsdbClients(unittest.TestCase):
+
+    class Client:
+        def __init__(self, url, token, **kwargs):
+            self.token = token
+
+        def update_token(self, token):
+            raise AssertionError("Tokens of shared clients must not change")
+
+    def test_client_per_token(self):
+        """Admin and write clients are different clients, shared by all markets, that keep their own token"""
+        clients = "_OngTsdbClientManager__clients"
+        with mock.patch.object(storage, "OngTsdbClient", self.Client), \
+                mock.patch.object(storage._OngTsdbClientManager, clients, dict()), \
+                mock.patch.object(storage, "config",
+                                  lambda key, default=None: f"{key}_value" if key.endswith("_token") else default):
+            market1 = TsdbStorage("db", "market1", "1D", "Europe/Madrid")
+            market2 = TsdbStorage("db", "market2", "1D", "Europe/Madrid")
+            self.assertIsNot(market1.admin_client, market1.write_client)
+            self.assertIs(market1.write_client, market2.write_client)
+            self.assertEqual(market2.admin_client.token, "admin_token_value")
+            self.assertEqual(market1.write_client.token, "write_token_value")
+
+
+if __name__ == '__main__':
+    unittest.main()
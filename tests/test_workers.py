@@ -0,0 +1,45 @@
+"""
+Tests for the worker pools shared by downloaders
+"""
+import asyncio
+import threading
+import unittest
+
+from commodity_data.downloaders.workers import get_worker_pool, worker_pools_stats, shutdown_worker_pools
+
+
+class TestWorkerPools(unittest.TestCase):
+
+    def test_pool_is_shared(self):
+        """Same name returns the same pool, and threads are reused among calls"""
+        pool = get_worker_pool("test_shared", 2)
+        self.assertIs(pool, get_worker_pool("test_shared", 8))
+        self.assertEqual(pool.max_workers, 2)
+        threads = set()
+        for _ in range(5):
+            threads.update(pool.map(lambda _: threading.get_ident(), range(10)))
+        self.assertLessEqual(len(threads), 2, "Pool created new threads")
+
+    def test_run_and_stats(self):
+        """Coroutines can await functions in the pool, and usage is reported"""
+        pool = get_worker_pool("test_stats", 3)
+
+        async def main():
+            return await asyncio.gather(*(pool.run(pow, i, 2) for i in range(6)))
+
+        self.assertEqual(asyncio.run(main()), [i ** 2 for i in range(6)])
+        stats = worker_pools_stats()["test_stats"]
+        self.assertEqual(stats["submitted"], 6)
+        self.assertEqual(stats["completed"], 6)
+        self.assertEqual(stats["running"], 0)
+
+    def test_shutdown(self):
+        """Pools can be used again after being shut down"""
+        pool = get_worker_pool("test_shutdown", 1)
+        self.assertEqual(pool.map(abs, [-1]), [1])
+        shutdown_worker_pools()
+        self.assertEqual(pool.map(abs, [-2]), [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
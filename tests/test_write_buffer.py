@@ -0,0 +1,86 @@
+"""
+Tests for the buffer that coalesces writes to the database
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from commodity_data.downloaders.write_buffer import WriteBuffer
+
+
+class TestWriteBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.written = list()
+        self.flushed = list()
+        dates = pd.bdate_range("2024-01-01", periods=10, tz="Europe/Madrid")
+        self.df = pd.DataFrame(np.arange(20.0).reshape(10, 2), index=dates, columns=["close", "maturity"])
+
+    def write(self, df: pd.DataFrame):
+        self.written.append(df)
+        return True
+
+    def buffer(self, **limits) -> WriteBuffer:
+        retval = WriteBuffer(self.write, "test")
+        retval.max_rows, retval.max_bytes, retval.max_seconds = None, None, None
+        for key, value in limits.items():
+            setattr(retval, key, value)
+        return retval
+
+    def test_coalesce(self):
+        """Chunks with the same columns are written together, and callbacks called after writing"""
+        buffer = self.buffer()
+        for idx in range(0, 10, 2):
+            buffer.add(self.df.iloc[idx:idx + 2], on_flush=lambda idx=idx: self.flushed.append(idx))
+        self.assertEqual(self.written, [])
+        self.assertEqual(buffer.pending_rows, 10)
+        buffer.flush()
+        self.assertEqual(len(self.written), 1)
+        pd.testing.assert_frame_equal(self.written[0], self.df)
+        self.assertEqual(self.flushed, [0, 2, 4, 6, 8])
+        self.assertEqual((buffer.pending_rows, buffer.pending_bytes), (0, 0))
+
+    def test_limits(self):
+        """Buffer is flushed when a limit is exceeded"""
+        buffer = self.buffer(max_rows=4)
+        for idx in range(0, 10, 2):
+            buffer.add(self.df.iloc[idx:idx + 2])
+        self.assertEqual([len(df) for df in self.written], [4, 4])
+        buffer = self.buffer(max_seconds=0)
+        buffer.add(self.df)
+        self.assertEqual(len(self.written), 3)
+
+    def test_columns(self):
+        """Chunks with different columns are written separately, so missing columns are not written as NaN"""
+        buffer = self.buffer()
+        buffer.add(self.df.iloc[:5])
+        buffer.add(self.df.iloc[5:, :1])
+        buffer.add(self.df.iloc[3:5])   # Same dates again: last values are written
+        buffer.flush()
+        self.assertEqual(sorted(df.shape for df in self.written), [(5, 1), (5, 2)])
+
+    def test_exception(self):
+        """Buffered data is written when exiting with an exception, and kept in the buffer if writing fails"""
+        buffer = self.buffer()
+        with self.assertRaises(ValueError):
+            with buffer:
+                buffer.add(self.df)
+                raise ValueError()
+        self.assertEqual(len(self.written), 1)
+
+        def fail(df):
+            raise IOError("Could not write")
+        buffer = WriteBuffer(fail, "test")
+        buffer.add(self.df, on_flush=lambda: self.flushed.append(True))
+        with self.assertRaises(IOError):
+            buffer.flush()
+        self.assertEqual(buffer.pending_rows, len(self.df))
+        self.assertEqual(self.flushed, [])
+        with self.assertRaises(KeyError):
+            with buffer:
+                raise KeyError()    # Error writing the buffer is logged, original exception is raised
+
+
+if __name__ == '__main__':
+    unittest.main()